@@ -3,27 +3,35 @@ AURA HAIR STUDIO - WhatsApp Bot with Calendar/Booking Integration
 OpenAI Tools API with strict mode for reliable function calling
 """
 import os
+import re
+import time
 import asyncio
 import logging
-import json
+import threading
+import hashlib
+import orjson
 import psycopg2
 import psycopg2.errors
-import pytz
-from datetime import datetime, timedelta
-from typing import Dict, Any, List
+import psycopg2.pool
+from zoneinfo import ZoneInfo
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from functools import lru_cache
+from datetime import datetime, timedelta, date as dt_date, time as dt_time
+from types import MappingProxyType
+from typing import Dict, Any, List, Optional, NamedTuple
 from pathlib import Path
 
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 import httpx
 import openai
+from cachetools import TTLCache
 
-# Google Calendar imports
+# Google Calendar imports (auth only - API calls go through httpx REST)
 from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request as GoogleRequest
-from googleapiclient.discovery import build
 
 # Email imports
 import smtplib
@@ -65,8 +73,18 @@ logger.info(f"OpenAI SDK version: {openai.__version__} (major: {OPENAI_SDK_VERSI
 
 # Initialize client based on SDK version
 if OPENAI_SDK_VERSION >= 1:
-    # New SDK v1.0+ syntax
-    openai_client = openai.OpenAI(api_key=OPENAI_API_KEY)
+    # New SDK v1.0+ syntax (async client - calls are awaited on the event
+    # loop). Explicit httpx client with HTTP/2 and a keep-alive pool so
+    # concurrent completions multiplex over warm connections instead of
+    # paying a TLS handshake each.
+    openai_client = openai.AsyncOpenAI(
+        api_key=OPENAI_API_KEY,
+        http_client=httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(60.0, connect=5.0),
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100)
+        )
+    )
 else:
     # Old SDK v0.x syntax
     openai.api_key = OPENAI_API_KEY
@@ -93,7 +111,7 @@ GOOGLE_CREDENTIALS_FILE = GOOGLE_CREDS_DIR / "credentials.json"
 GOOGLE_TOKEN_FILE = GOOGLE_CREDS_DIR / "token.json"
 GOOGLE_SCOPES = ["https://www.googleapis.com/auth/calendar"]
 GOOGLE_CALENDAR_ID = os.getenv("GOOGLE_CALENDAR_ID", "primary")
-ITALY_TZ = pytz.timezone("Europe/Rome")
+ITALY_TZ = ZoneInfo("Europe/Rome")
 
 # Email Configuration for Reminders
 EMAIL_SENDER = "notifiche.lyo@gmail.com"
@@ -102,60 +120,144 @@ OWNER_EMAIL = "notifiche.lyo@gmail.com"
 SMTP_SERVER = "smtp.gmail.com"
 SMTP_PORT = 587
 
-# Google Calendar Service (initialized lazily)
-_calendar_service = None
+# Google Calendar credentials (loaded lazily, refreshed when expired).
+# The lock keeps two simultaneous webhooks from double-loading the token
+# file or racing each other on the refresh + rewrite.
+_calendar_creds = None
+_calendar_creds_lock = threading.Lock()
 
-def get_calendar_service():
-    """Get or initialize Google Calendar service"""
-    global _calendar_service
+def _write_token_file(creds):
+    """Persist refreshed credentials atomically (no torn token file)"""
+    tmp_path = GOOGLE_TOKEN_FILE.with_suffix(".tmp")
+    with open(tmp_path, 'w') as f:
+        f.write(creds.to_json())
+    os.replace(tmp_path, GOOGLE_TOKEN_FILE)
 
-    if _calendar_service is not None:
-        return _calendar_service
+def _get_calendar_creds():
+    """Get valid Google Calendar credentials, or None when unavailable"""
+    global _calendar_creds
 
     try:
-        creds = None
+        with _calendar_creds_lock:
+            creds = _calendar_creds
+            if creds is None:
+                if not GOOGLE_TOKEN_FILE.exists():
+                    logger.warning("⚠️ Google Calendar credentials missing")
+                    return None
+                creds = Credentials.from_authorized_user_file(str(GOOGLE_TOKEN_FILE), GOOGLE_SCOPES)
 
-        # Load existing token
-        if GOOGLE_TOKEN_FILE.exists():
-            creds = Credentials.from_authorized_user_file(str(GOOGLE_TOKEN_FILE), GOOGLE_SCOPES)
+            if creds.expired and creds.refresh_token:
+                creds.refresh(GoogleRequest())
+                _write_token_file(creds)
 
-        # Refresh or reauthorize if needed
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(GoogleRequest())
-            # Save refreshed token
-            with open(GOOGLE_TOKEN_FILE, 'w') as f:
-                f.write(creds.to_json())
-
-        if not creds or not creds.valid:
-            logger.warning("⚠️ Google Calendar credentials invalid or missing")
-            return None
+            if not creds.valid:
+                logger.warning("⚠️ Google Calendar credentials invalid")
+                return None
 
-        _calendar_service = build('calendar', 'v3', credentials=creds)
-        logger.info("✅ Google Calendar service initialized")
-        return _calendar_service
+            _calendar_creds = creds
+            return creds
 
     except Exception as e:
-        logger.error(f"❌ Failed to initialize Google Calendar: {e}")
+        logger.error(f"❌ Failed to load Google Calendar credentials: {e}")
+        return None
+
+# Calendar REST calls go through one pooled client instead of
+# googleapiclient's httplib2 transport: keep-alive + HTTP/2 avoid a fresh
+# TLS handshake per event operation, and there is no discovery document
+# to fetch. Sync client because these functions run on worker threads.
+_gcal_http = httpx.Client(
+    base_url="https://www.googleapis.com/calendar/v3",
+    http2=True,
+    timeout=httpx.Timeout(15.0, connect=5.0),
+    limits=httpx.Limits(max_keepalive_connections=5, max_connections=10)
+)
+
+def _gcal_request(method: str, path: str, **kwargs):
+    """
+    Authorized Calendar REST request.
+
+    Returns the response, or None when credentials are unavailable.
+    Retries once on 401 (access token revoked/expired mid-lifetime).
+    """
+    creds = _get_calendar_creds()
+    if creds is None:
         return None
 
+    response = _gcal_http.request(
+        method, path, headers={"Authorization": f"Bearer {creds.token}"}, **kwargs
+    )
+    if response.status_code == 401 and creds.refresh_token:
+        with _calendar_creds_lock:
+            creds.refresh(GoogleRequest())
+            _write_token_file(creds)
+        response = _gcal_http.request(
+            method, path, headers={"Authorization": f"Bearer {creds.token}"}, **kwargs
+        )
+    response.raise_for_status()
+    return response
+
 # Business Configuration
 BUSINESS_NAME = "Aura Hair Studio"
 BUSINESS_TYPE = "beauty_salon"
 
-# Salon Services
-SALON_SERVICES = {
-    "taglio_donna": {"name_it": "Taglio Donna", "name_en": "Women's Haircut", "price": 60, "duration": 45},
-    "taglio_uomo": {"name_it": "Taglio Uomo", "name_en": "Men's Haircut", "price": 40, "duration": 45},
-    "piega": {"name_it": "Piega", "name_en": "Styling/Blow-dry", "price": 30, "duration": 30},
-    "colore_base": {"name_it": "Colore Base", "name_en": "Basic Color", "price": 70, "duration": 90},
-    "balayage": {"name_it": "Balayage/Schiariture", "name_en": "Balayage/Highlights", "price": 130, "duration": 150},
-    "trattamento_ristrutturante": {"name_it": "Trattamento Ristrutturante", "name_en": "Restructuring Treatment", "price": 45, "duration": 45},
-    "trattamento_cute": {"name_it": "Trattamento Cute", "name_en": "Scalp Treatment", "price": 40, "duration": 30}
+# Salon Services. NamedTuple instead of per-service dicts: attribute
+# loads are cheaper than hashed key lookups on the booking path, and the
+# records are immutable. The mapping itself is read-only too.
+class Service(NamedTuple):
+    name_it: str
+    name_en: str
+    price: int
+    duration: int
+
+SALON_SERVICES = MappingProxyType({
+    "taglio_donna": Service("Taglio Donna", "Women's Haircut", 60, 45),
+    "taglio_uomo": Service("Taglio Uomo", "Men's Haircut", 40, 45),
+    "piega": Service("Piega", "Styling/Blow-dry", 30, 30),
+    "colore_base": Service("Colore Base", "Basic Color", 70, 90),
+    "balayage": Service("Balayage/Schiariture", "Balayage/Highlights", 130, 150),
+    "trattamento_ristrutturante": Service("Trattamento Ristrutturante", "Restructuring Treatment", 45, 45),
+    "trattamento_cute": Service("Trattamento Cute", "Scalp Treatment", 40, 30)
+})
+
+# Error payloads list the valid codes on every invalid-service attempt;
+# build the list once instead of materializing keys() per call. The
+# catalog keys are already lowercase, so lookups only lower the input.
+VALID_SERVICE_CODES = list(SALON_SERVICES)
+
+# Bookable 30-minute slot grid per weekday, precomputed once: opening
+# hours are static (Tue-Fri 9:00-18:00, Sat 9:00-17:00), so per-call slot
+# generation was pure repeated datetime/strftime work. Closed days are
+# rejected by validate_business_day_and_time before lookup.
+def _build_slot_grid(closing_hour: int) -> tuple:
+    return tuple(
+        f"{hour:02d}:{minute}"
+        for hour in range(9, closing_hour)
+        for minute in ("00", "30")
+    )
+
+SLOTS_BY_WEEKDAY = {
+    weekday: _build_slot_grid(17 if weekday == 5 else 18)
+    for weekday in range(6)  # Monday-Saturday; Sunday has no grid
 }
 
-# Get today's date for the prompt
-TODAY = datetime.now().strftime("%Y-%m-%d")
-TOMORROW = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+# Hourly grid used when suggesting alternatives to a taken slot
+HOURLY_SLOTS = tuple(f"{hour:02d}:00" for hour in range(9, 18))
+
+# One query per weekday, precomputed: the grid is inlined as a VALUES
+# list and the set difference against booked slots happens in Postgres
+# (an anti-join probing the partial slot index), so only the free slots
+# come back over the wire - no per-row Python set math or formatting.
+_AVAILABLE_SLOTS_SQL_BY_WEEKDAY = {
+    weekday: (
+        "SELECT to_char(s.slot, 'HH24:MI') FROM (VALUES "
+        + ",".join(f"('{slot}'::time)" for slot in slots)
+        + ") s(slot) WHERE NOT EXISTS ("
+        "SELECT 1 FROM salon_appointments "
+        "WHERE appointment_date = %s AND appointment_time = s.slot AND status = 'confirmed'"
+        ") ORDER BY s.slot"
+    )
+    for weekday, slots in SLOTS_BY_WEEKDAY.items()
+}
 
 # Generate next 14 days calendar for the prompt
 def generate_date_calendar():
@@ -190,10 +292,11 @@ def generate_date_calendar():
 
     return "\n".join(calendar_lines)
 
-DATE_CALENDAR = generate_date_calendar()
-
-# System prompt with booking capabilities
-SYSTEM_PROMPT = f"""You are Simone, an employee at Aura Hair Studio in Milan, Italy.
+# Static system prompt with booking capabilities. Deliberately free of
+# dates: OpenAI's prompt caching only hits on an exact prefix match, so
+# everything that changes per calendar day lives in the small dynamic
+# message below and this large block stays byte-identical across days.
+_STATIC_SYSTEM_PROMPT = """You are Simone, an employee at Aura Hair Studio in Milan, Italy.
 
 ══════════════════════════════════════════════════════════════
 🌐 LANGUAGE RULE - MANDATORY - FOLLOW THE LANGUAGE INSTRUCTION:
@@ -228,12 +331,14 @@ SYSTEM_PROMPT = f"""You are Simone, an employee at Aura Hair Studio in Milan, It
    - FORBIDDEN WORDS: artificial, virtual, chatbot, language model
    - Speak naturally as a real salon employee
 
-📅 CALENDARIO PROSSIMI GIORNI (IMPORTANTE - USA QUESTE DATE!):
-{DATE_CALENDAR}
+📅 DATE RULE:
+   A separate system message titled "CALENDARIO PROSSIMI GIORNI" gives
+   today's date, tomorrow's date, and the exact YYYY-MM-DD date of each
+   upcoming weekday.
 
    ⚠️ QUANDO IL CLIENTE DICE UN GIORNO (es. "martedì", "venerdì"):
-   → Guarda il calendario sopra e usa la DATA ESATTA (YYYY-MM-DD)
-   → NON inventare date! Usa SOLO le date nel calendario sopra!
+   → Guarda quel calendario e usa la DATA ESATTA (YYYY-MM-DD)
+   → NON inventare date! Usa SOLO le date nel calendario!
 
 📍 SALON INFO:
 - Name: Aura Hair Studio
@@ -283,7 +388,7 @@ BOOKING FLOW:
 1. COLLECT INFO (only for NEW bookings):
    - Customer name
    - Desired service (taglio_donna, taglio_uomo, piega, colore_base, balayage, etc.)
-   - Preferred date (convert "tomorrow" to {TOMORROW})
+   - Preferred date (convert "tomorrow" using the date calendar message)
    - Preferred time (use 24h format: 15:00 for 3 PM)
 
 2. ASK FOR CONFIRMATION:
@@ -414,20 +519,68 @@ BOOKING FLOW:
 
 Respond naturally and warmly like a real salon employee named Simone."""
 
+@lru_cache(maxsize=2)
+def _build_date_prompt(today_iso: str) -> str:
+    """Build the small per-day date block (cached per date)"""
+    tomorrow = (dt_date.fromisoformat(today_iso) + timedelta(days=1)).isoformat()
+    return (f"📅 CALENDARIO PROSSIMI GIORNI (IMPORTANTE - USA QUESTE DATE!):\n"
+            f"OGGI È: {today_iso}\n"
+            f"DOMANI È: {tomorrow}\n"
+            f"{generate_date_calendar()}")
+
+# Built once: the static system message never changes, and the per-day
+# message dict is memoized below, so each turn reuses the same two dicts
+# instead of re-allocating a ~3KB prompt payload. Callers never mutate
+# message dicts (only the surrounding list), so sharing is safe.
+_STATIC_SYSTEM_MSG = {"role": "system", "content": _STATIC_SYSTEM_PROMPT}
+
+@lru_cache(maxsize=2)
+def _date_prompt_msg(today_iso: str) -> Dict[str, str]:
+    return {"role": "system", "content": _build_date_prompt(today_iso)}
+
+def get_system_messages() -> List[Dict[str, str]]:
+    """
+    System messages for today: the big static prompt first (so OpenAI's
+    prefix cache hits across days and customers), then the per-day dates.
+    Returns a fresh list over shared message dicts.
+    """
+    return [
+        _STATIC_SYSTEM_MSG,
+        _date_prompt_msg(datetime.now().strftime("%Y-%m-%d")),
+    ]
+
+def get_system_prompt() -> str:
+    """Flattened system prompt for today (scripts/tests convenience)"""
+    return "\n\n".join(m["content"] for m in get_system_messages())
+
+# Import-time snapshots, kept for scripts and tests that inspect them;
+# the message path calls get_system_prompt() instead.
+DATE_CALENDAR = generate_date_calendar()
+SYSTEM_PROMPT = get_system_prompt()
+
 # ============================================================================
 # UTILITY FUNCTIONS
 # ============================================================================
 
+# Precompiled so normalize_phone strips non-digits in one C-level pass
+# instead of a per-character Python generator (it runs on every webhook).
+_NON_DIGIT_RE = re.compile(r"\D+")
+
+@lru_cache(maxsize=4096)
 def normalize_phone(phone: str) -> str:
     """
     Normalize phone number to consistent format.
     Handles: +393312671591, 393312671591, 03312671591, etc.
     Returns: digits only, no leading zeros
+
+    Memoized: every booking function normalizes the caller's phone, so
+    within a conversation the same input repeats constantly. Pure
+    string-to-string, so caching is safe; 4096 entries bound memory.
     """
     if not phone:
         return phone
     # Remove all non-digits
-    digits = ''.join(c for c in phone if c.isdigit())
+    digits = _NON_DIGIT_RE.sub("", phone)
     # Remove leading zeros (but keep at least the number)
     digits = digits.lstrip('0') or digits
     return digits
@@ -436,25 +589,20 @@ def normalize_phone(phone: str) -> str:
 # GOOGLE CALENDAR FUNCTIONS
 # ============================================================================
 
-def create_calendar_event(customer_name: str, service: Dict, date_str: str, time_str: str, customer_phone: str = None) -> str:
+def create_calendar_event(customer_name: str, service: Service, date_str: str, time_str: str, customer_phone: str = None) -> str:
     """
     Create a Google Calendar event for the appointment.
     Returns: event_id if successful, None if failed
     """
     try:
-        service_obj = get_calendar_service()
-        if not service_obj:
-            logger.warning("⚠️ Google Calendar not available, skipping event creation")
-            return None
-
         # Parse date and time
-        dt = datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M")
-        start_dt = ITALY_TZ.localize(dt)
-        end_dt = start_dt + timedelta(minutes=service.get("duration", 60))
+        dt = datetime.fromisoformat(f"{date_str}T{time_str}")
+        start_dt = dt.replace(tzinfo=ITALY_TZ)
+        end_dt = start_dt + timedelta(minutes=service.duration)
 
         event = {
-            "summary": f"{service.get('name_it', 'Appuntamento')} - {customer_name}",
-            "description": f"Cliente: {customer_name}\nTelefono: {customer_phone or 'N/A'}\nServizio: {service.get('name_it')}\nPrezzo: €{service.get('price', 0)}",
+            "summary": f"{service.name_it} - {customer_name}",
+            "description": f"Cliente: {customer_name}\nTelefono: {customer_phone or 'N/A'}\nServizio: {service.name_it}\nPrezzo: €{service.price}",
             "start": {
                 "dateTime": start_dt.isoformat(),
                 "timeZone": "Europe/Rome"
@@ -472,8 +620,11 @@ def create_calendar_event(customer_name: str, service: Dict, date_str: str, time
             }
         }
 
-        result = service_obj.events().insert(calendarId=GOOGLE_CALENDAR_ID, body=event).execute()
-        event_id = result.get("id")
+        response = _gcal_request("POST", f"/calendars/{GOOGLE_CALENDAR_ID}/events", json=event)
+        if response is None:
+            logger.warning("⚠️ Google Calendar not available, skipping event creation")
+            return None
+        event_id = response.json().get("id")
         logger.info(f"✅ Calendar event created: {event_id}")
         return event_id
 
@@ -482,7 +633,7 @@ def create_calendar_event(customer_name: str, service: Dict, date_str: str, time
         return None
 
 
-def update_calendar_event(event_id: str, customer_name: str, service: Dict, date_str: str, time_str: str, customer_phone: str = None) -> bool:
+def update_calendar_event(event_id: str, customer_name: str, service: Service, date_str: str, time_str: str, customer_phone: str = None) -> bool:
     """
     Update an existing Google Calendar event.
     Returns: True if successful, False if failed
@@ -491,19 +642,14 @@ def update_calendar_event(event_id: str, customer_name: str, service: Dict, date
         return False
 
     try:
-        service_obj = get_calendar_service()
-        if not service_obj:
-            logger.warning("⚠️ Google Calendar not available, skipping event update")
-            return False
-
         # Parse date and time
-        dt = datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M")
-        start_dt = ITALY_TZ.localize(dt)
-        end_dt = start_dt + timedelta(minutes=service.get("duration", 60))
+        dt = datetime.fromisoformat(f"{date_str}T{time_str}")
+        start_dt = dt.replace(tzinfo=ITALY_TZ)
+        end_dt = start_dt + timedelta(minutes=service.duration)
 
         event = {
-            "summary": f"{service.get('name_it', 'Appuntamento')} - {customer_name}",
-            "description": f"Cliente: {customer_name}\nTelefono: {customer_phone or 'N/A'}\nServizio: {service.get('name_it')}\nPrezzo: €{service.get('price', 0)}",
+            "summary": f"{service.name_it} - {customer_name}",
+            "description": f"Cliente: {customer_name}\nTelefono: {customer_phone or 'N/A'}\nServizio: {service.name_it}\nPrezzo: €{service.price}",
             "start": {
                 "dateTime": start_dt.isoformat(),
                 "timeZone": "Europe/Rome"
@@ -514,7 +660,10 @@ def update_calendar_event(event_id: str, customer_name: str, service: Dict, date
             }
         }
 
-        service_obj.events().update(calendarId=GOOGLE_CALENDAR_ID, eventId=event_id, body=event).execute()
+        response = _gcal_request("PUT", f"/calendars/{GOOGLE_CALENDAR_ID}/events/{event_id}", json=event)
+        if response is None:
+            logger.warning("⚠️ Google Calendar not available, skipping event update")
+            return False
         logger.info(f"✅ Calendar event updated: {event_id}")
         return True
 
@@ -532,12 +681,10 @@ def delete_calendar_event(event_id: str) -> bool:
         return False
 
     try:
-        service_obj = get_calendar_service()
-        if not service_obj:
+        response = _gcal_request("DELETE", f"/calendars/{GOOGLE_CALENDAR_ID}/events/{event_id}")
+        if response is None:
             logger.warning("⚠️ Google Calendar not available, skipping event deletion")
             return False
-
-        service_obj.events().delete(calendarId=GOOGLE_CALENDAR_ID, eventId=event_id).execute()
         logger.info(f"✅ Calendar event deleted: {event_id}")
         return True
 
@@ -545,6 +692,44 @@ def delete_calendar_event(event_id: str) -> bool:
         logger.error(f"❌ Failed to delete calendar event: {e}")
         return False
 
+
+def _sync_appointment_to_gcal(appointment_id: int, customer_name: str, service: "Service",
+                              date_str: str, time_str: str, customer_phone: str = None):
+    """
+    Create the Calendar event for an already-committed appointment and
+    persist the event id. Runs in the background so the webhook reply
+    never waits on the Calendar API.
+    """
+    try:
+        event_id = create_calendar_event(
+            customer_name=customer_name,
+            service=service,
+            date_str=date_str,
+            time_str=time_str,
+            customer_phone=customer_phone
+        )
+        if event_id:
+            with get_db_connection() as conn:
+                cur = conn.cursor()
+                cur.execute(
+                    "UPDATE salon_appointments SET google_event_id = %s WHERE id = %s",
+                    (event_id, appointment_id)
+                )
+                conn.commit()
+    except Exception as e:
+        logger.error(f"❌ Background calendar sync failed for appointment #{appointment_id}: {e}")
+
+
+def _schedule_calendar_sync(appointment_id: int, customer_name: str, service: "Service",
+                            date_str: str, time_str: str, customer_phone: str = None):
+    """Fire-and-forget the Calendar sync on a daemon thread."""
+    threading.Thread(
+        target=_sync_appointment_to_gcal,
+        args=(appointment_id, customer_name, service, date_str, time_str, customer_phone),
+        daemon=True,
+        name=f"gcal-sync-{appointment_id}"
+    ).start()
+
 # ============================================================================
 # REMINDER SYSTEM
 # ============================================================================
@@ -573,36 +758,35 @@ def send_email(to_email: str, subject: str, body: str) -> bool:
 def get_tomorrow_appointments() -> List[Dict]:
     """Get all confirmed appointments for tomorrow"""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
+        with get_db_connection() as conn:
+            cur = conn.cursor()
 
-        tomorrow = (datetime.now(ITALY_TZ) + timedelta(days=1)).strftime("%Y-%m-%d")
+            tomorrow = (datetime.now(ITALY_TZ) + timedelta(days=1)).strftime("%Y-%m-%d")
 
-        cur.execute("""
-            SELECT id, customer_phone, customer_name, service_type,
-                   appointment_date, appointment_time, price
-            FROM salon_appointments
-            WHERE appointment_date = %s
-              AND status = 'confirmed'
-              AND (reminder_sent_at IS NULL OR reminder_sent_at < CURRENT_DATE)
-            ORDER BY appointment_time
-        """, (tomorrow,))
-
-        appointments = []
-        for row in cur.fetchall():
-            appointments.append({
-                "id": row[0],
-                "phone": row[1],
-                "name": row[2],
-                "service": row[3],
-                "date": row[4],
-                "time": row[5],
-                "price": row[6]
-            })
-
-        cur.close()
-        conn.close()
-        return appointments
+            cur.execute("""
+                SELECT id, customer_phone, customer_name, service_type,
+                       appointment_date, appointment_time, price
+                FROM salon_appointments
+                WHERE appointment_date = %s
+                  AND status = 'confirmed'
+                  AND (reminder_sent_at IS NULL OR reminder_sent_at < CURRENT_DATE)
+                ORDER BY appointment_time
+            """, (tomorrow,))
+
+            appointments = []
+            for row in cur.fetchall():
+                appointments.append({
+                    "id": row[0],
+                    "phone": row[1],
+                    "name": row[2],
+                    "service": row[3],
+                    "date": row[4],
+                    "time": row[5],
+                    "price": row[6]
+                })
+
+            cur.close()
+            return appointments
     except Exception as e:
         logger.error(f"❌ Error getting tomorrow appointments: {e}")
         return []
@@ -611,37 +795,36 @@ def get_tomorrow_appointments() -> List[Dict]:
 def get_unconfirmed_appointments() -> List[Dict]:
     """Get appointments where reminder was sent but not confirmed"""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
+        with get_db_connection() as conn:
+            cur = conn.cursor()
 
-        tomorrow = (datetime.now(ITALY_TZ) + timedelta(days=1)).strftime("%Y-%m-%d")
+            tomorrow = (datetime.now(ITALY_TZ) + timedelta(days=1)).strftime("%Y-%m-%d")
 
-        cur.execute("""
-            SELECT id, customer_phone, customer_name, service_type,
-                   appointment_date, appointment_time, price
-            FROM salon_appointments
-            WHERE appointment_date = %s
-              AND status = 'confirmed'
-              AND reminder_sent_at IS NOT NULL
-              AND reminder_confirmed = FALSE
-            ORDER BY appointment_time
-        """, (tomorrow,))
-
-        appointments = []
-        for row in cur.fetchall():
-            appointments.append({
-                "id": row[0],
-                "phone": row[1],
-                "name": row[2],
-                "service": row[3],
-                "date": row[4],
-                "time": row[5],
-                "price": row[6]
-            })
-
-        cur.close()
-        conn.close()
-        return appointments
+            cur.execute("""
+                SELECT id, customer_phone, customer_name, service_type,
+                       appointment_date, appointment_time, price
+                FROM salon_appointments
+                WHERE appointment_date = %s
+                  AND status = 'confirmed'
+                  AND reminder_sent_at IS NOT NULL
+                  AND reminder_confirmed = FALSE
+                ORDER BY appointment_time
+            """, (tomorrow,))
+
+            appointments = []
+            for row in cur.fetchall():
+                appointments.append({
+                    "id": row[0],
+                    "phone": row[1],
+                    "name": row[2],
+                    "service": row[3],
+                    "date": row[4],
+                    "time": row[5],
+                    "price": row[6]
+                })
+
+            cur.close()
+            return appointments
     except Exception as e:
         logger.error(f"❌ Error getting unconfirmed appointments: {e}")
         return []
@@ -650,17 +833,16 @@ def get_unconfirmed_appointments() -> List[Dict]:
 def mark_reminder_sent(appointment_id: int) -> bool:
     """Mark that reminder was sent for an appointment"""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("""
-            UPDATE salon_appointments
-            SET reminder_sent_at = CURRENT_TIMESTAMP
-            WHERE id = %s
-        """, (appointment_id,))
-        conn.commit()
-        cur.close()
-        conn.close()
-        return True
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                UPDATE salon_appointments
+                SET reminder_sent_at = CURRENT_TIMESTAMP
+                WHERE id = %s
+            """, (appointment_id,))
+            conn.commit()
+            cur.close()
+            return True
     except Exception as e:
         logger.error(f"❌ Error marking reminder sent: {e}")
         return False
@@ -669,28 +851,27 @@ def mark_reminder_sent(appointment_id: int) -> bool:
 def mark_reminder_confirmed(phone: str) -> Dict:
     """Mark appointment as confirmed by customer"""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-
-        tomorrow = (datetime.now(ITALY_TZ) + timedelta(days=1)).strftime("%Y-%m-%d")
-        normalized_phone = normalize_phone(phone)
+        with get_db_connection() as conn:
+            cur = conn.cursor()
 
-        # Find appointment for tomorrow from this phone
-        cur.execute("""
-            UPDATE salon_appointments
-            SET reminder_confirmed = TRUE,
-                reminder_confirmed_at = CURRENT_TIMESTAMP
-            WHERE customer_phone = %s
-              AND appointment_date = %s
-              AND status = 'confirmed'
-              AND reminder_sent_at IS NOT NULL
-            RETURNING id, customer_name, service_type, appointment_time
-        """, (normalized_phone, tomorrow))
-
-        result = cur.fetchone()
-        conn.commit()
-        cur.close()
-        conn.close()
+            tomorrow = (datetime.now(ITALY_TZ) + timedelta(days=1)).strftime("%Y-%m-%d")
+            normalized_phone = normalize_phone(phone)
+
+            # Find appointment for tomorrow from this phone
+            cur.execute("""
+                UPDATE salon_appointments
+                SET reminder_confirmed = TRUE,
+                    reminder_confirmed_at = CURRENT_TIMESTAMP
+                WHERE customer_phone = %s
+                  AND appointment_date = %s
+                  AND status = 'confirmed'
+                  AND reminder_sent_at IS NOT NULL
+                RETURNING id, customer_name, service_type, appointment_time
+            """, (normalized_phone, tomorrow))
+
+            result = cur.fetchone()
+            conn.commit()
+            cur.close()
 
         if result:
             # Convert time to string for JSON serialization
@@ -713,7 +894,7 @@ async def send_reminder_messages():
     """Send reminder messages to all customers with tomorrow's appointments (runs at 10 AM)"""
     logger.info("🔔 Starting daily reminder job...")
 
-    appointments = get_tomorrow_appointments()
+    appointments = await asyncio.to_thread(get_tomorrow_appointments)
     logger.info(f"📋 Found {len(appointments)} appointments for tomorrow")
 
     for apt in appointments:
@@ -737,7 +918,7 @@ Grazie!"""
         success = await send_whatsapp_message(phone, reminder_message)
 
         if success:
-            mark_reminder_sent(apt["id"])
+            await asyncio.to_thread(mark_reminder_sent, apt["id"])
             logger.info(f"✅ Reminder sent to {apt['name']} ({phone}) for {time_str}")
         else:
             logger.error(f"❌ Failed to send reminder to {apt['name']} ({phone})")
@@ -749,7 +930,7 @@ async def check_unconfirmed_and_notify():
     """Check for unconfirmed appointments and email owner (runs at 6 PM)"""
     logger.info("📧 Starting unconfirmed appointments check...")
 
-    unconfirmed = get_unconfirmed_appointments()
+    unconfirmed = await asyncio.to_thread(get_unconfirmed_appointments)
     logger.info(f"📋 Found {len(unconfirmed)} unconfirmed appointments")
 
     if not unconfirmed:
@@ -784,8 +965,9 @@ Sistema Aura Hair Studio"""
         logger.error(f"❌ Failed to send unconfirmed appointments email")
 
 
-# Scheduler instance
-scheduler = AsyncIOScheduler(timezone=ITALY_TZ)
+# Scheduler instance. APScheduler 3.x normalizes string timezones with its
+# own pytz dependency, so pass the name rather than the ZoneInfo object.
+scheduler = AsyncIOScheduler(timezone="Europe/Rome")
 
 
 def setup_reminder_scheduler():
@@ -793,7 +975,7 @@ def setup_reminder_scheduler():
     # 10:00 AM - Send reminders
     scheduler.add_job(
         send_reminder_messages,
-        CronTrigger(hour=10, minute=0, timezone=ITALY_TZ),
+        CronTrigger(hour=10, minute=0, timezone="Europe/Rome"),
         id="send_reminders",
         replace_existing=True
     )
@@ -801,7 +983,7 @@ def setup_reminder_scheduler():
     # 6:00 PM - Check unconfirmed and email owner
     scheduler.add_job(
         check_unconfirmed_and_notify,
-        CronTrigger(hour=18, minute=0, timezone=ITALY_TZ),
+        CronTrigger(hour=18, minute=0, timezone="Europe/Rome"),
         id="check_unconfirmed",
         replace_existing=True
     )
@@ -814,82 +996,193 @@ def setup_reminder_scheduler():
 # DATABASE FUNCTIONS
 # ============================================================================
 
+# Connection pool: opening a fresh TCP+auth connection to Postgres on
+# every message costs tens of ms and eats server connection slots.
+# Pooled checkouts are sub-millisecond. Created lazily so importing the
+# module (tests, tooling) doesn't require a reachable database.
+_db_pool = None
+_db_pool_lock = threading.Lock()
+
+def _get_db_pool():
+    """Get or create the shared connection pool"""
+    global _db_pool
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                _db_pool = psycopg2.pool.ThreadedConnectionPool(
+                    minconn=int(os.getenv("DB_POOL_MIN", "2")),
+                    maxconn=int(os.getenv("DB_POOL_MAX", "20")),
+                    **DB_CONFIG
+                )
+    return _db_pool
+
+@contextmanager
 def get_db_connection():
-    """Get database connection"""
-    return psycopg2.connect(**DB_CONFIG)
+    """Borrow a pooled database connection for the duration of a with-block"""
+    db_pool = _get_db_pool()
+    conn = db_pool.getconn()
+    try:
+        yield conn
+    except Exception:
+        # Don't return a connection with an open aborted transaction
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        raise
+    finally:
+        db_pool.putconn(conn)
+
+# Set by initialize_database once the unique partial slot index is known
+# to exist. create_appointment only emits ON CONFLICT (which resolves
+# against that index at plan time) when this is True; otherwise it falls
+# back to the plain insert guarded by the UniqueViolation handler.
+_slot_unique_index_ok = False
 
 def initialize_database():
     """Initialize salon appointments table"""
+    global _slot_unique_index_ok
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Create appointments table for salon
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS salon_appointments (
-                id SERIAL PRIMARY KEY,
-                customer_phone VARCHAR(20) NOT NULL,
-                customer_name VARCHAR(100) NOT NULL,
-                service_type VARCHAR(50) NOT NULL,
-                appointment_date DATE NOT NULL,
-                appointment_time TIME NOT NULL,
-                duration_minutes INTEGER DEFAULT 60,
-                price DECIMAL(10,2),
-                status VARCHAR(20) DEFAULT 'confirmed',
-                google_event_id VARCHAR(255),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                reminder_sent_at TIMESTAMP,
-                reminder_confirmed BOOLEAN DEFAULT FALSE,
-                reminder_confirmed_at TIMESTAMP
-            )
-        """)
+        with get_db_connection() as conn:
+            cur = conn.cursor()
 
-        # Add reminder columns if they don't exist (for existing tables)
-        try:
-            cur.execute("ALTER TABLE salon_appointments ADD COLUMN IF NOT EXISTS reminder_sent_at TIMESTAMP")
-            cur.execute("ALTER TABLE salon_appointments ADD COLUMN IF NOT EXISTS reminder_confirmed BOOLEAN DEFAULT FALSE")
-            cur.execute("ALTER TABLE salon_appointments ADD COLUMN IF NOT EXISTS reminder_confirmed_at TIMESTAMP")
-        except:
-            pass  # Columns already exist
-        
-        # Create conversation history table
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS salon_conversations (
-                id SERIAL PRIMARY KEY,
-                phone VARCHAR(20) NOT NULL,
-                name VARCHAR(100),
-                message TEXT,
-                response TEXT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        conn.commit()
-        conn.close()
-        logger.info("✅ Database initialized")
-        return True
+            # Create appointments table for salon
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS salon_appointments (
+                    id SERIAL PRIMARY KEY,
+                    customer_phone VARCHAR(20) NOT NULL,
+                    customer_name VARCHAR(100) NOT NULL,
+                    service_type VARCHAR(50) NOT NULL,
+                    appointment_date DATE NOT NULL,
+                    appointment_time TIME NOT NULL,
+                    duration_minutes INTEGER DEFAULT 60,
+                    price DECIMAL(10,2),
+                    status VARCHAR(20) DEFAULT 'confirmed',
+                    google_event_id VARCHAR(255),
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    reminder_sent_at TIMESTAMP,
+                    reminder_confirmed BOOLEAN DEFAULT FALSE,
+                    reminder_confirmed_at TIMESTAMP
+                )
+            """)
+
+            # Add reminder columns if they don't exist (for existing tables)
+            try:
+                cur.execute("ALTER TABLE salon_appointments ADD COLUMN IF NOT EXISTS reminder_sent_at TIMESTAMP")
+                cur.execute("ALTER TABLE salon_appointments ADD COLUMN IF NOT EXISTS reminder_confirmed BOOLEAN DEFAULT FALSE")
+                cur.execute("ALTER TABLE salon_appointments ADD COLUMN IF NOT EXISTS reminder_confirmed_at TIMESTAMP")
+            except:
+                pass  # Columns already exist
+
+            # Enforce one confirmed booking per slot at the DB level. The
+            # availability SELECT in create_appointment is only advisory - two
+            # concurrent bookings can both see the slot free - so the index is
+            # what actually prevents double-booking (the insert then raises
+            # UniqueViolation, which create_appointment already handles).
+            # Guarded in its own transaction: a legacy database that already
+            # holds duplicate confirmed rows makes CREATE UNIQUE INDEX fail,
+            # and that must not abort the rest of init or take bookings down -
+            # create_appointment checks the flag and skips ON CONFLICT when
+            # the index is missing.
+            conn.commit()
+            try:
+                cur.execute("""
+                    CREATE UNIQUE INDEX IF NOT EXISTS salon_appointments_slot_unique
+                    ON salon_appointments (appointment_date, appointment_time)
+                    WHERE status = 'confirmed'
+                """)
+                conn.commit()
+                _slot_unique_index_ok = True
+            except Exception as e:
+                conn.rollback()
+                _slot_unique_index_ok = False
+                logger.error(
+                    f"❌ Could not create unique slot index: {e} - "
+                    "likely duplicate confirmed rows from before the constraint existed. "
+                    "Double-booking protection degrades to advisory checks until the "
+                    "duplicates are cleaned up and the service restarted."
+                )
+
+            # Covers get_customer_appointments entirely: the key prefix
+            # matches its WHERE + ORDER BY (so no sort), and the INCLUDEd
+            # payload columns make it an index-only scan - no heap access
+            cur.execute("DROP INDEX IF EXISTS salon_appointments_customer_idx")
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS salon_appointments_customer_covering_idx
+                ON salon_appointments (customer_phone, appointment_date, appointment_time)
+                INCLUDE (id, customer_name, service_type, price)
+                WHERE status = 'confirmed'
+            """)
+
+            # Create conversation history table
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS salon_conversations (
+                    id SERIAL PRIMARY KEY,
+                    phone VARCHAR(20) NOT NULL,
+                    name VARCHAR(100),
+                    message TEXT,
+                    response TEXT,
+                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
+            conn.commit()
+            logger.info("✅ Database initialized")
+            return True
     except Exception as e:
         logger.error(f"❌ Database init error: {e}")
         return False
 
-def save_conversation_to_db(phone: str, name: str, message: str, response: str):
+def _flush_conversation_batch(rows: List[tuple]):
     """
-    Save conversation to database for analytics and debugging.
+    Write a batch of conversation turns in one transaction.
     Wrapped in try/except so logging failure never breaks the bot.
     """
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO salon_conversations (phone, name, message, response, timestamp)
-            VALUES (%s, %s, %s, %s, NOW())
-        """, (phone, name, message, response))
-        conn.commit()
-        conn.close()
-        logger.info(f"💾 Conversation logged for {phone}")
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            cur.executemany("""
+                INSERT INTO salon_conversations (phone, name, message, response, timestamp)
+                VALUES (%s, %s, %s, %s, NOW())
+            """, rows)
+            conn.commit()
+        logger.info(f"💾 Logged {len(rows)} conversation turn(s)")
     except Exception as e:
         # Never fail the bot because of logging issues
-        logger.warning(f"⚠️ Failed to log conversation: {e}")
+        logger.warning(f"⚠️ Failed to log conversation batch: {e}")
+
+def save_conversation_to_db(phone: str, name: str, message: str, response: str):
+    """Save a single conversation turn (synchronous fallback path)"""
+    _flush_conversation_batch([(phone, name, message, response)])
+
+# Conversation logging is analytics-only, so it runs fire-and-forget: turns
+# are queued here and a background task batches them into one commit, which
+# keeps the INSERT's commit fsync off the user-visible reply path and cuts
+# fsyncs N-fold under burst.
+_convo_queue: "asyncio.Queue" = asyncio.Queue()
+_convo_writer_task = None
+_CONVO_BATCH_MAX = 50
+_CONVO_BATCH_WINDOW = 0.5  # seconds to wait for more rows before flushing
+
+async def _convo_writer():
+    """Drain the conversation queue in batches and flush off the event loop"""
+    loop = asyncio.get_running_loop()
+    while True:
+        rows = [await _convo_queue.get()]
+        deadline = loop.time() + _CONVO_BATCH_WINDOW
+        while len(rows) < _CONVO_BATCH_MAX:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                rows.append(await asyncio.wait_for(_convo_queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        await asyncio.to_thread(_flush_conversation_batch, rows)
+
+def log_conversation(phone: str, name: str, message: str, response: str):
+    """Queue a conversation turn for the background batch writer"""
+    _convo_queue.put_nowait((phone, name, message, response))
 
 # ============================================================================
 # BUSINESS HOURS VALIDATION
@@ -908,7 +1201,8 @@ def validate_business_day_and_time(date_str: str, time_str: str = None) -> Dict[
     Returns: {"valid": True} or {"valid": False, "error": str, "error_code": str}
     """
     try:
-        parsed_date = datetime.strptime(date_str, "%Y-%m-%d")
+        # fromisoformat is C-implemented and much cheaper than strptime
+        parsed_date = dt_date.fromisoformat(date_str)
     except ValueError:
         return {"valid": False, "error": "Invalid date format", "error_code": "INVALID_DATE_FORMAT"}
 
@@ -984,6 +1278,55 @@ def validate_business_day_and_time(date_str: str, time_str: str = None) -> Dict[
 # BOOKING FUNCTIONS (Called by AI)
 # ============================================================================
 
+def _booking_error(operation: str, exc: Exception) -> Dict[str, Any]:
+    """
+    Map an unexpected exception to the structured error payload the model
+    sees. One dispatch point instead of per-function except bodies: raw
+    psycopg2 messages (SQL fragments, constraint names) never leak into
+    the conversation, and transient failures get a retryable code so the
+    model suggests trying again instead of giving up.
+    """
+    if isinstance(exc, psycopg2.errors.UniqueViolation):
+        logger.warning(f"⚠️ {operation}: slot already booked")
+        return {
+            "success": False,
+            "error": "SLOT_JUST_BOOKED",
+            "message": "This time slot was just booked by another customer. Please choose a different time."
+        }
+    if isinstance(exc, (psycopg2.errors.SerializationFailure, psycopg2.OperationalError)):
+        logger.warning(f"⚠️ {operation}: transient database error: {exc}")
+        return {
+            "success": False,
+            "error": "TEMPORARY_ERROR",
+            "message": "A temporary problem occurred. Please ask the customer to try again in a moment."
+        }
+    logger.exception(f"❌ {operation} error")
+    return {"success": False, "error": "INTERNAL_ERROR"}
+
+def _slot_taken(cur, date: str, time: str) -> bool:
+    """
+    EXISTS probe for a confirmed booking, via a server-side prepared
+    statement so Postgres plans the query once per pooled connection
+    instead of re-parsing the same SQL on every message.
+
+    Prepared lazily (EAFP): the first EXECUTE on a fresh connection fails
+    with InvalidSqlStatementName, we PREPARE and retry. Safe because the
+    probe is always the first statement of its transaction.
+    """
+    try:
+        cur.execute("EXECUTE slot_exists (%s, %s)", (date, time))
+    except psycopg2.errors.InvalidSqlStatementName:
+        cur.connection.rollback()  # the failed EXECUTE aborted the transaction
+        cur.execute("""
+            PREPARE slot_exists (date, time) AS
+            SELECT EXISTS(
+                SELECT 1 FROM salon_appointments
+                WHERE appointment_date = $1 AND appointment_time = $2 AND status = 'confirmed'
+            )
+        """)
+        cur.execute("EXECUTE slot_exists (%s, %s)", (date, time))
+    return cur.fetchone()[0]
+
 def create_appointment(customer_phone: str, customer_name: str, service_type: str, date: str, time: str) -> Dict[str, Any]:
     """Create a salon appointment"""
     try:
@@ -1002,12 +1345,12 @@ def create_appointment(customer_phone: str, customer_name: str, service_type: st
                 "success": False,
                 "error": "INVALID_SERVICE",
                 "provided": service_type,
-                "valid_services": list(SALON_SERVICES.keys())
+                "valid_services": VALID_SERVICE_CODES
             }
 
         # Validate date and time together (check if in the past)
         try:
-            appointment_datetime = datetime.strptime(f"{date} {time}", "%Y-%m-%d %H:%M")
+            appointment_datetime = datetime.fromisoformat(f"{date}T{time}")
             if appointment_datetime < datetime.now():
                 return {"success": False, "error": "PAST_DATE_NOT_ALLOWED"}
         except ValueError:
@@ -1025,19 +1368,12 @@ def create_appointment(customer_phone: str, customer_name: str, service_type: st
                 "time": time
             }
 
-        conn = get_db_connection()
-        try:
+        with get_db_connection() as conn:
             cur = conn.cursor()
 
-            # Check availability
-            cur.execute(
-                """SELECT COUNT(*) FROM salon_appointments
-                   WHERE appointment_date = %s AND appointment_time = %s AND status = 'confirmed'""",
-                (date, time)
-            )
-            count = cur.fetchone()[0]
-
-            if count > 0:
+            # Check availability. EXISTS short-circuits on the first hit and
+            # resolves as an index-only probe of the slot index.
+            if _slot_taken(cur, date, time):
                 # Get available alternatives for the same date
                 cur.execute(
                     """SELECT appointment_time FROM salon_appointments
@@ -1045,11 +1381,12 @@ def create_appointment(customer_phone: str, customer_name: str, service_type: st
                        ORDER BY appointment_time""",
                     (date,)
                 )
-                booked_times = [str(row[0])[:5] for row in cur.fetchall()]
+                # Format from the native time objects - no throwaway
+                # "HH:MM:SS" strings; a set makes the membership test O(1)
+                booked_times = {f"{row[0].hour:02d}:{row[0].minute:02d}" for row in cur}
 
                 # Suggest alternatives
-                all_slots = ["09:00", "10:00", "11:00", "12:00", "13:00", "14:00", "15:00", "16:00", "17:00"]
-                available_alternatives = [t for t in all_slots if t not in booked_times][:4]
+                available_alternatives = [t for t in HOURLY_SLOTS if t not in booked_times][:4]
 
                 return {
                     "success": False,
@@ -1061,43 +1398,66 @@ def create_appointment(customer_phone: str, customer_name: str, service_type: st
                     "message_it": f"Mi dispiace, {time} del {date} è già prenotato. Orari disponibili: {', '.join(available_alternatives)}"
                 }
 
-            # Create Google Calendar event first
-            google_event_id = create_calendar_event(
-                customer_name=customer_name,
-                service=service,
-                date_str=date,
-                time_str=time,
-                customer_phone=normalized_phone
-            )
+            # Create the appointment first; the Google Calendar event is a
+            # side-effect the customer never waits for, so it is synced in
+            # the background after the commit. ON CONFLICT against the
+            # partial slot index makes the insert atomic: if another booking
+            # won the race since the advisory check above, no row comes back
+            # and we bail out instead of raising.
+            if _slot_unique_index_ok:
+                cur.execute(
+                    """INSERT INTO salon_appointments
+                       (customer_phone, customer_name, service_type, appointment_date, appointment_time, duration_minutes, price, status)
+                       VALUES (%s, %s, %s, %s, %s, %s, %s, 'confirmed')
+                       ON CONFLICT (appointment_date, appointment_time) WHERE status = 'confirmed'
+                       DO NOTHING
+                       RETURNING id""",
+                    (normalized_phone, customer_name, service_type, date, time, service.duration, service.price)
+                )
+            else:
+                # The unique slot index is missing (legacy duplicates at
+                # init time), so ON CONFLICT would fail at plan time. Fall
+                # back to a plain insert; the advisory check above and the
+                # UniqueViolation handler below are the only guards.
+                cur.execute(
+                    """INSERT INTO salon_appointments
+                       (customer_phone, customer_name, service_type, appointment_date, appointment_time, duration_minutes, price, status)
+                       VALUES (%s, %s, %s, %s, %s, %s, %s, 'confirmed')
+                       RETURNING id""",
+                    (normalized_phone, customer_name, service_type, date, time, service.duration, service.price)
+                )
 
-            # Create appointment with google_event_id
-            cur.execute(
-                """INSERT INTO salon_appointments
-                   (customer_phone, customer_name, service_type, appointment_date, appointment_time, duration_minutes, price, status, google_event_id)
-                   VALUES (%s, %s, %s, %s, %s, %s, %s, 'confirmed', %s)
-                   RETURNING id""",
-                (normalized_phone, customer_name, service_type, date, time, service["duration"], service["price"], google_event_id)
-            )
+            inserted = cur.fetchone()
+            if inserted is None:
+                logger.warning(f"⚠️ Race condition: slot {date} {time} taken by another booking")
+                return {
+                    "success": False,
+                    "error": "SLOT_JUST_BOOKED",
+                    "date": date,
+                    "time": time
+                }
 
-            appointment_id = cur.fetchone()[0]
+            appointment_id = inserted[0]
             conn.commit()
+            _invalidate_slots_cache(date)
 
-            calendar_note = " (synced to calendar)" if google_event_id else ""
-            logger.info(f"✅ Appointment created: #{appointment_id} for {customer_name}{calendar_note}")
+            # Sync to Google Calendar off the webhook path - the WhatsApp
+            # reply shouldn't wait 200-500ms on a Calendar API round-trip
+            _schedule_calendar_sync(appointment_id, customer_name, service, date, time, normalized_phone)
+
+            logger.info(f"✅ Appointment created: #{appointment_id} for {customer_name} (calendar sync scheduled)")
 
             return {
                 "success": True,
                 "appointment_id": appointment_id,
                 "customer_name": customer_name,
-                "service": service['name_it'],
-                "service_en": service.get('name_en', service_type),
+                "service": service.name_it,
+                "service_en": service.name_en,
                 "date": date,
                 "time": time,
-                "price": service['price'],
-                "calendar_synced": bool(google_event_id)
+                "price": service.price,
+                "calendar_synced": True
             }
-        finally:
-            conn.close()
 
     except psycopg2.errors.UniqueViolation:
         # Race condition: slot was taken between check and insert
@@ -1109,22 +1469,14 @@ def create_appointment(customer_phone: str, customer_name: str, service_type: st
             "time": time
         }
     except Exception as e:
-        logger.error(f"❌ Create appointment error: {e}")
-        return {"success": False, "error": "BOOKING_ERROR", "details": str(e)}
+        return _booking_error("create_appointment", e)
 
 def check_availability(date: str, time: str) -> Dict[str, Any]:
     """Check if a time slot is available"""
     try:
-        conn = get_db_connection()
-        try:
+        with get_db_connection() as conn:
             cur = conn.cursor()
-            cur.execute(
-                """SELECT COUNT(*) FROM salon_appointments
-                   WHERE appointment_date = %s AND appointment_time = %s AND status = 'confirmed'""",
-                (date, time)
-            )
-            count = cur.fetchone()[0]
-            available = count == 0
+            available = not _slot_taken(cur, date, time)
 
             return {
                 "success": True,
@@ -1132,16 +1484,19 @@ def check_availability(date: str, time: str) -> Dict[str, Any]:
                 "date": date,
                 "time": time
             }
-        finally:
-            conn.close()
 
     except Exception as e:
-        return {"success": False, "error": str(e)}
+        return _booking_error("check_availability", e)
 
 def format_time_12h(time_str: str) -> str:
     """Convert 24h time (HH:MM) to 12h format (h:MM AM/PM)"""
     try:
-        time_obj = datetime.strptime(str(time_str)[:5], "%H:%M")
+        # psycopg2 hands us datetime.time objects already - skip the
+        # str round-trip in that case
+        if isinstance(time_str, dt_time):
+            time_obj = time_str
+        else:
+            time_obj = dt_time.fromisoformat(str(time_str)[:5])
         return time_obj.strftime("%I:%M %p").lstrip("0")  # "6:00 PM" not "06:00 PM"
     except:
         return str(time_str)[:5]
@@ -1156,12 +1511,14 @@ def get_customer_appointments(customer_phone: str) -> Dict[str, Any]:
         now = datetime.now()
         today = now.date()
 
-        conn = get_db_connection()
-        try:
+        with get_db_connection() as conn:
             cur = conn.cursor()
-            # Only get future appointments (today with future time, or future dates)
+            # Only get future appointments (today with future time, or future
+            # dates). status is pinned by the WHERE clause, so it isn't
+            # selected; the projection matches the covering index exactly and
+            # is served by an index-only scan, already in ORDER BY order.
             cur.execute(
-                """SELECT id, customer_name, service_type, appointment_date, appointment_time, price, status
+                """SELECT id, customer_name, service_type, appointment_date, appointment_time, price
                    FROM salon_appointments
                    WHERE customer_phone = %s AND status = 'confirmed'
                    AND (appointment_date > %s OR (appointment_date = %s AND appointment_time > %s))
@@ -1171,18 +1528,18 @@ def get_customer_appointments(customer_phone: str) -> Dict[str, Any]:
 
             appointments = []
             for idx, row in enumerate(cur.fetchall(), 1):
-                service = SALON_SERVICES.get(row[2], {})
+                service = SALON_SERVICES.get(row[2])
                 apt_id = row[0]
                 appointments.append({
                     "appointment_id": apt_id,  # ⚠️ USE THIS ID for modify_appointment and cancel_appointment
                     "booked_name": row[1],  # Name given when booking
                     "service_code": row[2],
-                    "service_en": service.get("name_en", row[2]),
-                    "service_it": service.get("name_it", row[2]),
-                    "date": str(row[3]),
+                    "service_en": service.name_en if service else row[2],
+                    "service_it": service.name_it if service else row[2],
+                    "date": row[3].isoformat(),
                     "time": format_time_12h(row[4]),
                     "price": float(row[5]) if row[5] else 0,
-                    "status": row[6]
+                    "status": "confirmed"
                 })
 
             if not appointments:
@@ -1200,11 +1557,9 @@ def get_customer_appointments(customer_phone: str) -> Dict[str, Any]:
                 "appointments": appointments,
                 "count": len(appointments)
             }
-        finally:
-            conn.close()
 
     except Exception as e:
-        return {"success": False, "error": str(e)}
+        return _booking_error("get_customer_appointments", e)
 
 def cancel_appointment(customer_phone: str, appointment_id: int) -> Dict[str, Any]:
     """Cancel an appointment"""
@@ -1212,13 +1567,12 @@ def cancel_appointment(customer_phone: str, appointment_id: int) -> Dict[str, An
         # Normalize phone
         normalized_phone = normalize_phone(customer_phone)
 
-        conn = get_db_connection()
-        try:
+        with get_db_connection() as conn:
             cur = conn.cursor()
 
             # Verify appointment belongs to customer and get google_event_id
             cur.execute(
-                """SELECT id, google_event_id FROM salon_appointments
+                """SELECT id, google_event_id, appointment_date FROM salon_appointments
                    WHERE id = %s AND customer_phone = %s AND status = 'confirmed'""",
                 (appointment_id, normalized_phone)
             )
@@ -1232,10 +1586,7 @@ def cancel_appointment(customer_phone: str, appointment_id: int) -> Dict[str, An
                 }
 
             google_event_id = row[1]
-
-            # Delete from Google Calendar
-            if google_event_id:
-                delete_calendar_event(google_event_id)
+            appointment_date = row[2]
 
             # Cancel appointment
             cur.execute(
@@ -1243,6 +1594,17 @@ def cancel_appointment(customer_phone: str, appointment_id: int) -> Dict[str, An
                 (appointment_id,)
             )
             conn.commit()
+            _invalidate_slots_cache(appointment_date.isoformat())
+
+            # Delete from Google Calendar off the request path - the
+            # customer shouldn't wait on Google to hear "cancellato"
+            if google_event_id:
+                threading.Thread(
+                    target=delete_calendar_event,
+                    args=(google_event_id,),
+                    daemon=True,
+                    name=f"gcal-delete-{appointment_id}"
+                ).start()
 
             calendar_note = " (removed from calendar)" if google_event_id else ""
             logger.info(f"✅ Appointment #{appointment_id} cancelled{calendar_note}")
@@ -1252,11 +1614,9 @@ def cancel_appointment(customer_phone: str, appointment_id: int) -> Dict[str, An
                 "cancelled_appointment_id": appointment_id,
                 "calendar_updated": bool(google_event_id)
             }
-        finally:
-            conn.close()
 
     except Exception as e:
-        return {"success": False, "error": str(e)}
+        return _booking_error("cancel_appointment", e)
 
 def modify_appointment(
     customer_phone: str,
@@ -1273,8 +1633,7 @@ def modify_appointment(
         # Normalize phone
         normalized_phone = normalize_phone(customer_phone)
 
-        conn = get_db_connection()
-        try:
+        with get_db_connection() as conn:
             cur = conn.cursor()
 
             # Find the appointment
@@ -1296,8 +1655,8 @@ def modify_appointment(
             # Current values
             current_name = appointment[1]
             current_service = appointment[2]
-            current_date = str(appointment[3])
-            current_time = str(appointment[4])[:5]  # HH:MM format
+            current_date = appointment[3].isoformat()
+            current_time = f"{appointment[4].hour:02d}:{appointment[4].minute:02d}"
             google_event_id = appointment[5]
 
             # Determine new values (use current if not provided)
@@ -1305,6 +1664,21 @@ def modify_appointment(
             final_time = new_time if new_time else current_time
             final_service = new_service.lower() if new_service else current_service
 
+            # Nothing actually changes? Skip the UPDATE and the Calendar
+            # round-trip entirely - the model sometimes re-sends current
+            # values when a customer merely re-confirms.
+            if (final_date, final_time, final_service) == (current_date, current_time, current_service):
+                logger.info(f"✅ Appointment #{appointment_id} unchanged - no-op modification")
+                return {
+                    "success": True,
+                    "appointment_id": appointment_id,
+                    "customer_name": current_name,
+                    "new_date": final_date,
+                    "new_time": final_time,
+                    "changes": {},
+                    "note": "No changes requested - appointment left as is"
+                }
+
             # Validate new service ONLY if being changed
             if new_service:
                 service = SALON_SERVICES.get(final_service)
@@ -1313,15 +1687,15 @@ def modify_appointment(
                         "success": False,
                         "error": "INVALID_SERVICE",
                         "provided": final_service,
-                        "valid_services": list(SALON_SERVICES.keys())
+                        "valid_services": VALID_SERVICE_CODES
                     }
             else:
                 # Keep existing service - get it for duration/price or use defaults
-                service = SALON_SERVICES.get(final_service, {"duration": 45, "price": 35, "name_it": final_service})
+                service = SALON_SERVICES.get(final_service, Service(final_service, final_service, 35, 45))
 
             # Validate new date and time together (check if in the past)
             try:
-                final_datetime = datetime.strptime(f"{final_date} {final_time}", "%Y-%m-%d %H:%M")
+                final_datetime = datetime.fromisoformat(f"{final_date}T{final_time}")
                 if final_datetime < datetime.now():
                     return {"success": False, "error": "PAST_DATE_NOT_ALLOWED"}
             except ValueError:
@@ -1339,43 +1713,54 @@ def modify_appointment(
                     "time": final_time
                 }
 
-            # Check if new slot is available (only if date or time changed)
-            if new_date or new_time:
-                cur.execute(
-                    """SELECT COUNT(*) FROM salon_appointments
-                       WHERE appointment_date = %s AND appointment_time = %s
-                       AND status = 'confirmed' AND id != %s""",
-                    (final_date, final_time, appointment_id)
-                )
-                if cur.fetchone()[0] > 0:
-                    return {
-                        "success": False,
-                        "error": "SLOT_ALREADY_BOOKED",
-                        "date": final_date,
-                        "time": final_time
-                    }
-
-            # Update the appointment
+            # Update only if the target slot is free, in one statement: the
+            # conflict guard and the write happen atomically, so no other
+            # booking can grab the slot between check and update, and one
+            # DB round-trip is saved on every modification.
             cur.execute(
                 """UPDATE salon_appointments
                    SET appointment_date = %s, appointment_time = %s, service_type = %s,
                        duration_minutes = %s, price = %s
-                   WHERE id = %s""",
-                (final_date, final_time, final_service, service["duration"], service["price"], appointment_id)
+                   WHERE id = %s
+                     AND NOT EXISTS (
+                         SELECT 1 FROM salon_appointments other
+                         WHERE other.appointment_date = %s AND other.appointment_time = %s
+                           AND other.status = 'confirmed' AND other.id != %s
+                     )
+                   RETURNING id""",
+                (final_date, final_time, final_service, service.duration, service.price,
+                 appointment_id, final_date, final_time, appointment_id)
             )
 
+            if cur.fetchone() is None:
+                # The appointment itself exists (selected above), so the
+                # only way the guarded update misses is a taken slot
+                return {
+                    "success": False,
+                    "error": "SLOT_ALREADY_BOOKED",
+                    "date": final_date,
+                    "time": final_time
+                }
+
             conn.commit()
+            _invalidate_slots_cache(current_date, final_date)
 
-            # Update Google Calendar event
+            # Update the Google Calendar event in the background, same as
+            # the create path - the reply shouldn't wait on Google
             if google_event_id:
-                update_calendar_event(
-                    event_id=google_event_id,
-                    customer_name=current_name,
-                    service=service,
-                    date_str=final_date,
-                    time_str=final_time,
-                    customer_phone=normalized_phone
-                )
+                threading.Thread(
+                    target=update_calendar_event,
+                    kwargs=dict(
+                        event_id=google_event_id,
+                        customer_name=current_name,
+                        service=service,
+                        date_str=final_date,
+                        time_str=final_time,
+                        customer_phone=normalized_phone
+                    ),
+                    daemon=True,
+                    name=f"gcal-update-{appointment_id}"
+                ).start()
 
             calendar_note = " (calendar updated)" if google_event_id else ""
             logger.info(f"✅ Appointment #{appointment_id} modified: {final_date} {final_time} {final_service}{calendar_note}")
@@ -1393,15 +1778,13 @@ def modify_appointment(
                 "success": True,
                 "appointment_id": appointment_id,
                 "customer_name": current_name,
-                "service": service['name_it'],
-                "service_en": service.get('name_en', final_service),
+                "service": service.name_it,
+                "service_en": service.name_en,
                 "new_date": final_date,
                 "new_time": final_time,
                 "changes": changes,
                 "calendar_updated": bool(google_event_id)
             }
-        finally:
-            conn.close()
 
     except psycopg2.errors.UniqueViolation:
         # Race condition: new slot was taken between check and update
@@ -1411,8 +1794,7 @@ def modify_appointment(
             "error": "SLOT_JUST_BOOKED"
         }
     except Exception as e:
-        logger.error(f"❌ Modify appointment error: {e}")
-        return {"success": False, "error": "MODIFICATION_ERROR", "details": str(e)}
+        return _booking_error("modify_appointment", e)
 
 def get_available_slots(date: str) -> Dict[str, Any]:
     """
@@ -1424,11 +1806,11 @@ def get_available_slots(date: str) -> Dict[str, Any]:
     try:
         # Validate date
         try:
-            parsed_date = datetime.strptime(date, "%Y-%m-%d")
+            parsed_date = dt_date.fromisoformat(date)
             now = datetime.now()
-            if parsed_date.date() < now.date():
+            if parsed_date < now.date():
                 return {"success": False, "error": "PAST_DATE_NOT_ALLOWED"}
-            is_today = parsed_date.date() == now.date()
+            is_today = parsed_date == now.date()
         except ValueError:
             return {"success": False, "error": "INVALID_DATE_FORMAT", "provided_date": date}
 
@@ -1445,36 +1827,19 @@ def get_available_slots(date: str) -> Dict[str, Any]:
                 "reason_it": business_validation.get("error_it", "")
             }
 
-        # Determine closing hour based on day
-        weekday = parsed_date.weekday()
-        closing_hour = 17 if weekday == 5 else 18  # Saturday: 17:00, others: 18:00
-
-        conn = get_db_connection()
-        try:
-            cur = conn.cursor()
-
-            # Get all booked times for this date
-            cur.execute(
-                """SELECT appointment_time FROM salon_appointments
-                   WHERE appointment_date = %s AND status = 'confirmed'""",
-                (date,)
-            )
-
-            booked_times = set()
-            for row in cur.fetchall():
-                # Store as HH:MM string
-                booked_times.add(str(row[0])[:5])
-        finally:
-            conn.close()
-
-        # Generate all possible slots based on business hours
-        all_slots = []
-        for hour in range(9, closing_hour):
-            all_slots.append(f"{hour:02d}:00")
-            all_slots.append(f"{hour:02d}:30")
-
-        # Filter out booked slots
-        available_slots = [slot for slot in all_slots if slot not in booked_times]
+        # One round-trip: Postgres diffs the weekday's static slot grid
+        # against booked appointments and returns only the free slots
+        slots_sql = _AVAILABLE_SLOTS_SQL_BY_WEEKDAY.get(parsed_date.weekday())
+        if slots_sql is None:
+            available_slots = []
+        else:
+            available_slots = _slots_cache_get(date)
+            if available_slots is None:
+                with get_db_connection() as conn:
+                    cur = conn.cursor()
+                    cur.execute(slots_sql, (date,))
+                    available_slots = [row[0] for row in cur.fetchall()]
+                _slots_cache_set(date, available_slots)
 
         # If today, filter out past times (with 30 min buffer)
         if is_today:
@@ -1498,8 +1863,7 @@ def get_available_slots(date: str) -> Dict[str, Any]:
         }
 
     except Exception as e:
-        logger.error(f"❌ Get available slots error: {e}")
-        return {"success": False, "error": str(e)}
+        return _booking_error("get_available_slots", e)
 
 # ============================================================================
 # OPENAI TOOLS DEFINITIONS (New API - replaces deprecated 'functions')
@@ -1527,7 +1891,7 @@ BOOKING_TOOLS = [
                     },
                     "date": {
                         "type": "string",
-                        "description": f"Appointment date in YYYY-MM-DD format. Today is {TODAY}, tomorrow is {TOMORROW}"
+                        "description": "Appointment date in YYYY-MM-DD format. Today is {TODAY}, tomorrow is {TOMORROW}"
                     },
                     "time": {
                         "type": "string",
@@ -1610,7 +1974,7 @@ BOOKING_TOOLS = [
                     },
                     "new_date": {
                         "type": ["string", "null"],
-                        "description": f"New date in YYYY-MM-DD format. Today is {TODAY}, tomorrow is {TOMORROW}. Use null if not changing date."
+                        "description": "New date in YYYY-MM-DD format. Today is {TODAY}, tomorrow is {TOMORROW}. Use null if not changing date."
                     },
                     "new_time": {
                         "type": ["string", "null"],
@@ -1638,7 +2002,7 @@ BOOKING_TOOLS = [
                 "properties": {
                     "date": {
                         "type": "string",
-                        "description": f"Date in YYYY-MM-DD format. Today is {TODAY}, tomorrow is {TOMORROW}"
+                        "description": "Date in YYYY-MM-DD format. Today is {TODAY}, tomorrow is {TOMORROW}"
                     }
                 },
                 "required": ["date"],
@@ -1680,59 +2044,79 @@ def convert_tools_to_functions(tools):
             functions.append(func)
     return functions
 
-BOOKING_FUNCTIONS = convert_tools_to_functions(BOOKING_TOOLS) if OPENAI_SDK_VERSION < 1 else None
+# BOOKING_TOOLS keeps {TODAY}/{TOMORROW} placeholders; concrete schemas are
+# interpolated lazily once per day so a long-running process never sends the
+# model stale date hints.
+_BOOKING_TOOLS_TEMPLATE = orjson.dumps(BOOKING_TOOLS).decode()
+_tools_cache_date = None
+_tools_for_today = None
+_functions_for_today = None
+
+def _get_tools_for_today():
+    """
+    Get (tools, functions) schemas with today's dates interpolated.
+    Rebuilt at most once per day; functions is None on SDK v1.0+.
+    """
+    global _tools_cache_date, _tools_for_today, _functions_for_today
+
+    today = datetime.now().strftime("%Y-%m-%d")
+    if _tools_cache_date != today:
+        tomorrow = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+        _tools_for_today = orjson.loads(
+            _BOOKING_TOOLS_TEMPLATE.replace("{TODAY}", today).replace("{TOMORROW}", tomorrow)
+        )
+        _functions_for_today = (
+            convert_tools_to_functions(_tools_for_today) if OPENAI_SDK_VERSION < 1 else None
+        )
+        _tools_cache_date = today
+
+    return _tools_for_today, _functions_for_today
 
 # ============================================================================
 # FUNCTION EXECUTION
 # ============================================================================
 
+# Tool dispatch table, built once at module load. Each handler takes the
+# parsed arguments dict plus the customer's phone (which the model never
+# supplies - it's taken from the webhook).
+_DISPATCH = {
+    "create_appointment": lambda args, phone: create_appointment(
+        customer_phone=phone,
+        customer_name=args["customer_name"],
+        service_type=args["service_type"],
+        date=args["date"],
+        time=args["time"]
+    ),
+    "check_availability": lambda args, phone: check_availability(
+        date=args["date"],
+        time=args["time"]
+    ),
+    "get_customer_appointments": lambda args, phone: get_customer_appointments(customer_phone=phone),
+    "cancel_appointment": lambda args, phone: cancel_appointment(
+        customer_phone=phone,
+        appointment_id=args["appointment_id"]
+    ),
+    "modify_appointment": lambda args, phone: modify_appointment(
+        customer_phone=phone,
+        appointment_id=args["appointment_id"],
+        new_date=args.get("new_date"),
+        new_time=args.get("new_time"),
+        new_service=args.get("new_service")
+    ),
+    "get_available_slots": lambda args, phone: get_available_slots(date=args["date"]),
+    "confirm_reminder": lambda args, phone: mark_reminder_confirmed(phone),
+}
+
 def execute_function(function_name: str, arguments: str, phone: str) -> Dict[str, Any]:
     """Execute a booking function"""
     try:
-        args = json.loads(arguments) if isinstance(arguments, str) else arguments
-        
-        if function_name == "create_appointment":
-            return create_appointment(
-                customer_phone=phone,
-                customer_name=args["customer_name"],
-                service_type=args["service_type"],
-                date=args["date"],
-                time=args["time"]
-            )
-        
-        elif function_name == "check_availability":
-            return check_availability(
-                date=args["date"],
-                time=args["time"]
-            )
-        
-        elif function_name == "get_customer_appointments":
-            return get_customer_appointments(customer_phone=phone)
-        
-        elif function_name == "cancel_appointment":
-            return cancel_appointment(
-                customer_phone=phone,
-                appointment_id=args["appointment_id"]
-            )
-
-        elif function_name == "modify_appointment":
-            return modify_appointment(
-                customer_phone=phone,
-                appointment_id=args["appointment_id"],
-                new_date=args.get("new_date"),
-                new_time=args.get("new_time"),
-                new_service=args.get("new_service")
-            )
-
-        elif function_name == "get_available_slots":
-            return get_available_slots(date=args["date"])
-
-        elif function_name == "confirm_reminder":
-            return mark_reminder_confirmed(phone)
+        args = orjson.loads(arguments) if isinstance(arguments, str) else arguments
 
-        else:
+        handler = _DISPATCH.get(function_name)
+        if handler is None:
             return {"success": False, "error": "UNKNOWN_FUNCTION", "function_name": function_name}
-    
+        return handler(args, phone)
+
     except Exception as e:
         logger.error(f"Function execution error: {e}")
         return {"success": False, "error": str(e)}
@@ -1741,7 +2125,167 @@ def execute_function(function_name: str, arguments: str, phone: str) -> Dict[str
 # CONVERSATION MANAGEMENT
 # ============================================================================
 
-conversation_history: Dict[str, List[Dict]] = {}
+# Optional Redis backend for conversation history: with multiple workers
+# or replicas an in-process store is a correctness bug (one worker can't
+# see another's history). When REDIS_URL is set, histories live under
+# hist:{phone} as orjson-encoded entries with a one-hour expiry.
+REDIS_URL = os.getenv("REDIS_URL", "")
+try:
+    import redis as redis_sync
+    import redis.asyncio as redis_asyncio
+except ImportError:
+    redis_sync = None
+    redis_asyncio = None
+
+_redis = redis_asyncio.from_url(REDIS_URL) if (REDIS_URL and redis_asyncio) else None
+_HISTORY_KEY = "hist:{}"
+_HISTORY_MAX_ENTRIES = 40   # 20 turns kept server-side
+_HISTORY_TTL_SECONDS = 3600
+
+# Cross-worker cache for free-slots-by-date: the answer only changes
+# through this bot's own mutations, so reads hit Redis with a short TTL
+# backstop and create/cancel/modify delete the affected day's key after
+# commit. Sync client because the booking functions run on worker
+# threads. No-op when Redis isn't configured - the in-process TTL cache
+# in _execute_function_cached still applies there.
+_slots_redis = redis_sync.from_url(REDIS_URL) if (REDIS_URL and redis_sync) else None
+_SLOTS_KEY = "slots:{}"
+_SLOTS_TTL_SECONDS = 60
+
+def _slots_cache_get(date: str) -> Optional[List[str]]:
+    """Cached free-slot list for a date; None on miss or no Redis"""
+    if _slots_redis is None:
+        return None
+    try:
+        raw = _slots_redis.get(_SLOTS_KEY.format(date))
+    except Exception as e:
+        logger.warning(f"⚠️ Slots cache read failed: {e}")
+        return None
+    return orjson.loads(raw) if raw else None
+
+def _slots_cache_set(date: str, slots: List[str]) -> None:
+    if _slots_redis is None:
+        return
+    try:
+        _slots_redis.set(_SLOTS_KEY.format(date), orjson.dumps(slots), ex=_SLOTS_TTL_SECONDS)
+    except Exception as e:
+        logger.warning(f"⚠️ Slots cache write failed: {e}")
+
+def _invalidate_slots_cache(*dates: str) -> None:
+    """Drop cached availability for the given dates after a mutation"""
+    if _slots_redis is None or not dates:
+        return
+    try:
+        _slots_redis.delete(*{_SLOTS_KEY.format(d) for d in dates})
+    except Exception as e:
+        logger.warning(f"⚠️ Slots cache invalidation failed: {e}")
+
+# In-process fallback when Redis isn't configured. Bounded on both axes:
+# at most 10,000 phones (LRU-evicted) each holding a deque capped at
+# _HISTORY_MAX_ENTRIES, so memory can't grow with traffic or history age.
+_HISTORY_PHONES_MAX = 10000
+conversation_history: "OrderedDict[str, deque]" = OrderedDict()
+
+def _local_history(phone: str) -> deque:
+    """Get (or create) the bounded local history deque for a phone"""
+    entries = conversation_history.get(phone)
+    if entries is None:
+        entries = deque(maxlen=_HISTORY_MAX_ENTRIES)
+        conversation_history[phone] = entries
+    else:
+        conversation_history.move_to_end(phone)
+    while len(conversation_history) > _HISTORY_PHONES_MAX:
+        conversation_history.popitem(last=False)
+    return entries
+
+async def _load_history(phone: str) -> List[Dict]:
+    """Load a customer's conversation history (Redis if configured)"""
+    if _redis is None:
+        return list(_local_history(phone))
+    raw = await _redis.lrange(_HISTORY_KEY.format(phone), 0, -1)
+    return [orjson.loads(entry) for entry in raw]
+
+async def _save_turn_to_history(phone: str, message: str, response: str) -> None:
+    """Append one user/assistant exchange to the customer's history"""
+    user_entry = {"role": "user", "content": message}
+    assistant_entry = {"role": "assistant", "content": response}
+    if _redis is None:
+        _local_history(phone).extend([user_entry, assistant_entry])
+        return
+    key = _HISTORY_KEY.format(phone)
+    pipe = _redis.pipeline()
+    pipe.rpush(key, orjson.dumps(user_entry), orjson.dumps(assistant_entry))
+    pipe.ltrim(key, -_HISTORY_MAX_ENTRIES, -1)
+    pipe.expire(key, _HISTORY_TTL_SECONDS)
+    await pipe.execute()
+
+# Trim history by tokens, not message count: ten short replies cost almost
+# nothing, while one long appointment listing can balloon the prompt to
+# thousands of tokens. Budgeting keeps TTFT and cost per turn flat.
+try:
+    import tiktoken
+    _token_encoder = tiktoken.encoding_for_model("gpt-4o")
+except Exception:
+    _token_encoder = None  # Fall back to message-count trimming
+
+HISTORY_TOKEN_BUDGET = 2000
+
+def _trim_history_for_budget(history: List[Dict], budget: int = HISTORY_TOKEN_BUDGET) -> List[Dict]:
+    """Return the newest suffix of history that fits within ~budget tokens"""
+    if _token_encoder is None:
+        return history[-10:]
+
+    total = 0
+    cut = len(history)
+    for i in range(len(history) - 1, -1, -1):
+        total += len(_token_encoder.encode(history[i].get("content") or ""))
+        if total > budget:
+            break
+        cut = i
+    return history[cut:]
+
+# Per-phone locks: serialize processing for one customer so two messages
+# arriving together can't both run the check-then-book flow and corrupt
+# the shared conversation_history. Bounded with LRU eviction.
+_PHONE_LOCKS_MAX = 10000
+_phone_locks: "OrderedDict[str, asyncio.Lock]" = OrderedDict()
+
+def _get_phone_lock(phone: str) -> asyncio.Lock:
+    """Get (or create) the processing lock for a phone number"""
+    lock = _phone_locks.get(phone)
+    if lock is None:
+        lock = asyncio.Lock()
+        _phone_locks[phone] = lock
+    else:
+        _phone_locks.move_to_end(phone)
+
+    # Evict least-recently-used locks that nobody is holding
+    while len(_phone_locks) > _PHONE_LOCKS_MAX:
+        oldest_phone, oldest_lock = next(iter(_phone_locks.items()))
+        if oldest_lock.locked():
+            break
+        del _phone_locks[oldest_phone]
+
+    return lock
+
+# Last-seen contact name per phone: WhatsApp includes the contacts block
+# only on some payloads, so remember names across messages instead of
+# re-walking the nested dicts (and falling back to "Cliente") every time.
+# Same bounded-LRU discipline as the phone locks above.
+_CONTACT_NAMES_MAX = 10000
+_contact_names: "OrderedDict[str, str]" = OrderedDict()
+
+def _resolve_contact_name(phone: str, value: Dict[str, Any]) -> str:
+    """Contact name from the payload, the per-phone cache, or 'Cliente'"""
+    contacts = value.get("contacts")
+    name = contacts[0].get("profile", {}).get("name") if contacts else None
+    if name:
+        _contact_names[phone] = name
+        _contact_names.move_to_end(phone)
+        while len(_contact_names) > _CONTACT_NAMES_MAX:
+            _contact_names.popitem(last=False)
+        return name
+    return _contact_names.get(phone, "Cliente")
 
 def detect_language(text: str) -> str:
     """
@@ -1811,20 +2355,273 @@ def detect_language(text: str) -> str:
         return 'it'
     return 'en'
 
-def get_ai_response(phone: str, message: str) -> str:
+# Canned replies for trivial greetings/thanks - these skip the gpt-4o
+# round-trip entirely. Confirmation words ("sì", "ok", "confermo") are
+# deliberately NOT listed: they can confirm a booking or a reminder and
+# must go through the AI.
+GREETING_RESPONSES = {
+    "ciao": "Ciao! Sono Simone di Aura Hair Studio 😊 Come posso aiutarti?",
+    "salve": "Salve! Sono Simone di Aura Hair Studio. Come posso aiutarti?",
+    "buongiorno": "Buongiorno! Sono Simone di Aura Hair Studio 😊 Come posso aiutarti?",
+    "buonasera": "Buonasera! Sono Simone di Aura Hair Studio 😊 Come posso aiutarti?",
+    "grazie": "Prego! A presto 😊",
+    "grazie mille": "Prego! A presto 😊",
+    "hi": "Hi! I'm Simone from Aura Hair Studio 😊 How can I help you?",
+    "hello": "Hello! I'm Simone from Aura Hair Studio 😊 How can I help you?",
+    "hey": "Hey! I'm Simone from Aura Hair Studio 😊 How can I help you?",
+    "thanks": "You're welcome! See you soon 😊",
+    "thank you": "You're welcome! See you soon 😊"
+}
+
+# Canned fallback replies, built once instead of per message
+FALLBACK_NONTEXT = (
+    "I can only respond to text messages. How can I help you with your booking? 💇‍♀️\n\n"
+    "Posso rispondere solo a messaggi di testo. Come posso aiutarti con la prenotazione? 💇‍♀️"
+)
+FALLBACK_RATE_LIMIT = (
+    "We're experiencing high demand. Please try again in a moment. "
+    "/ Alto traffico, riprova tra qualche secondo. "
+    "Or call us at +39 02 8394 5621 / Oppure chiamaci."
+)
+FALLBACK_TIMEOUT = (
+    "Connection slow, please try again. "
+    "/ Connessione lenta, riprova. "
+    "Or call us at +39 02 8394 5621 / Oppure chiamaci."
+)
+FALLBACK_CONNECTION = (
+    "Connection issue, please try again. "
+    "/ Problema di connessione, riprova. "
+    "Or call us at +39 02 8394 5621 / Oppure chiamaci."
+)
+FALLBACK_ERROR = (
+    "Something went wrong. Please try again or call us at +39 02 8394 5621. "
+    "/ Qualcosa è andato storto. Riprova o chiamaci al +39 02 8394 5621."
+)
+
+# Maximum tool-calling rounds per turn (model → tools → model ...)
+MAX_TOOL_ROUNDS = 3
+
+# Tool calls that only read the DB - safe to memoize within one turn
+_READ_ONLY_FUNCTIONS = {"check_availability", "get_customer_appointments", "get_available_slots"}
+
+# Availability reads also get a short cross-turn TTL cache: under bursty
+# traffic several customers ask about the same afternoon within seconds.
+# Not used for get_customer_appointments (per-customer, rarely repeated).
+_AVAILABILITY_FUNCTIONS = {"check_availability", "get_available_slots"}
+_availability_cache = TTLCache(maxsize=256, ttl=10)
+_availability_cache_lock = threading.Lock()
+
+# Customer appointment listings change only through this bot's own
+# mutations, so they tolerate a longer TTL than availability reads.
+_customer_appts_cache = TTLCache(maxsize=512, ttl=30)
+
+# Exact-match completion cache: identical (prompt, history, message)
+# requests at temperature=0 are deterministic, so repeats ("orari?",
+# "prezzi?") can skip OpenAI entirely. Only text-only answers are cached -
+# never tool-calling rounds, whose results depend on live DB state.
+# Accessed solely from the event loop, so no lock is needed.
+_completion_cache = TTLCache(maxsize=1000, ttl=1800)
+
+def _completion_cache_key(messages: List[Dict]) -> str:
+    """Stable key over the full request the model would see"""
+    return hashlib.sha256(orjson.dumps({"model": "gpt-4o", "messages": messages})).hexdigest()
+
+def _execute_function_cached(function_name: str, arguments: str, phone: str, turn_cache: Dict) -> Dict[str, Any]:
+    """
+    Execute a tool call, memoizing read-only queries.
+
+    Reads are cached for the current turn (the model sometimes repeats the
+    same query while self-correcting); availability reads additionally hit
+    a 10-second TTL cache shared across turns. Mutations bypass both caches
+    and invalidate them.
+    """
+    if function_name in _READ_ONLY_FUNCTIONS:
+        key = (function_name, arguments, phone)
+        if key in turn_cache:
+            logger.info(f"   (cache hit for {function_name} within turn)")
+            return turn_cache[key]
+
+        ttl_cache = None
+        if function_name in _AVAILABILITY_FUNCTIONS:
+            ttl_cache = _availability_cache
+        elif function_name == "get_customer_appointments":
+            ttl_cache = _customer_appts_cache
+
+        if ttl_cache is not None:
+            with _availability_cache_lock:
+                cached = ttl_cache.get(key)
+            if cached is not None:
+                logger.info(f"   (TTL cache hit for {function_name})")
+                turn_cache[key] = cached
+                return cached
+
+        result = execute_function(function_name, arguments, phone)
+        turn_cache[key] = result
+        if ttl_cache is not None:
+            with _availability_cache_lock:
+                ttl_cache[key] = result
+        return result
+
+    # Mutation: cached reads may now be stale
+    turn_cache.clear()
+    with _availability_cache_lock:
+        _availability_cache.clear()
+        _customer_appts_cache.clear()
+    return execute_function(function_name, arguments, phone)
+
+# Speculative pipelining (off by default): when the model's only tool call
+# is check_availability, start the follow-up "summarize" completion in
+# parallel with the DB query, assuming the slot is free. If the DB agrees
+# we've hidden the query latency; if not, the speculative call is cancelled
+# and the normal loop continues with the real result. Only worth enabling
+# when OpenAI round-trips are the bottleneck.
+SPECULATIVE_FINAL_CALL = os.getenv("SPECULATIVE_FINAL_CALL", "false").lower() == "true"
+
+def _predict_tool_results(tool_calls: List) -> Optional[List[Dict]]:
+    """
+    Predict the expected-case results for a round of tool calls.
+
+    Returns the predicted result list, or None if any call is not
+    predictable (anything other than check_availability).
+    """
+    predicted = []
+    for _, function_name, arguments in tool_calls:
+        if function_name != "check_availability":
+            return None
+        try:
+            args = orjson.loads(arguments)
+        except Exception:
+            return None
+        predicted.append({
+            "success": True,
+            "available": True,
+            "date": args.get("date"),
+            "time": args.get("time")
+        })
+    return predicted
+
+# Bound concurrent OpenAI requests: under a webhook burst this keeps the
+# process from opening hundreds of simultaneous completions (and tripping
+# org rate limits); excess turns queue on the semaphore instead.
+_OPENAI_CONCURRENCY = asyncio.Semaphore(20)
+
+# SDK adapters: the version check happens ONCE here, at import. The hot
+# path (_call_openai/_append_tool_calls/_append_tool_result) is bound to
+# exactly one implementation, so get_ai_response runs a single codepath.
+#
+# _call_openai returns (content, tool_calls) where tool_calls is a list of
+# (call_id, function_name, arguments_json) tuples (empty if no calls).
+if OPENAI_SDK_VERSION >= 1:
+
+    async def _call_openai(messages: List[Dict], with_tools: bool = True):
+        """Chat completion via SDK v1.0+ (async client)"""
+        kwargs = {"model": "gpt-4o", "messages": messages, "temperature": 0}
+        if with_tools:
+            kwargs["tools"] = _get_tools_for_today()[0]
+            kwargs["tool_choice"] = "auto"
+            async with _OPENAI_CONCURRENCY:
+                response = await openai_client.chat.completions.create(**kwargs)
+            assistant_message = response.choices[0].message
+            tool_calls = [
+                (tc.id, tc.function.name, tc.function.arguments)
+                for tc in (assistant_message.tool_calls or [])
+            ]
+            return assistant_message.content or '', tool_calls
+
+        # Final text reply: stream it. The message still goes to WhatsApp in
+        # one POST, but streaming starts delivery at the first token instead
+        # of after the full generation, trimming a few hundred ms per turn.
+        started = time.monotonic()
+        first_token_ms = None
+        parts = []
+        async with _OPENAI_CONCURRENCY:
+            stream = await openai_client.chat.completions.create(stream=True, **kwargs)
+            async for chunk in stream:
+                delta = chunk.choices[0].delta if chunk.choices else None
+                if delta and delta.content:
+                    if first_token_ms is None:
+                        first_token_ms = (time.monotonic() - started) * 1000
+                    parts.append(delta.content)
+        if first_token_ms is not None:
+            logger.info(f"⏱️ Streamed reply: first token after {first_token_ms:.0f}ms")
+        return ''.join(parts), []
+
+    def _append_tool_calls(messages: List[Dict], content: str, tool_calls: List) -> None:
+        """Append the assistant message that requested the given tool calls"""
+        messages.append({
+            "role": "assistant",
+            "content": content,
+            "tool_calls": [
+                {
+                    "id": call_id,
+                    "type": "function",
+                    "function": {"name": name, "arguments": arguments}
+                } for call_id, name, arguments in tool_calls
+            ]
+        })
+
+    def _append_tool_result(messages: List[Dict], call_id: str, name: str, result: Dict) -> None:
+        """Append a tool result message"""
+        messages.append({
+            "role": "tool",
+            "tool_call_id": call_id,
+            "content": orjson.dumps(result).decode()
+        })
+
+else:
+
+    async def _call_openai(messages: List[Dict], with_tools: bool = True):
+        """Chat completion via SDK v0.x (blocking - runs off the event loop)"""
+        kwargs = {"model": "gpt-4o", "messages": messages, "temperature": 0}
+        if with_tools:
+            kwargs["functions"] = _get_tools_for_today()[1]
+            kwargs["function_call"] = "auto"
+        async with _OPENAI_CONCURRENCY:
+            response = await asyncio.to_thread(openai.ChatCompletion.create, **kwargs)
+        assistant_message = response["choices"][0]["message"]
+        function_call = assistant_message.get("function_call")
+        tool_calls = (
+            [(None, function_call["name"], function_call["arguments"])]
+            if function_call else []
+        )
+        return assistant_message.get("content", '') or '', tool_calls
+
+    def _append_tool_calls(messages: List[Dict], content: str, tool_calls: List) -> None:
+        """Old SDK supports a single function_call per assistant message"""
+        _, name, arguments = tool_calls[0]
+        messages.append({
+            "role": "assistant",
+            "content": content,
+            "function_call": {"name": name, "arguments": arguments}
+        })
+
+    def _append_tool_result(messages: List[Dict], call_id: str, name: str, result: Dict) -> None:
+        """Append a function result message"""
+        messages.append({
+            "role": "function",
+            "name": name,
+            "content": orjson.dumps(result).decode()
+        })
+
+async def get_ai_response(phone: str, message: str) -> str:
     """
     Get AI response with SDK version compatibility.
 
     Supports both old SDK (v0.x) and new SDK (v1.0+) syntax.
     Key features:
     - Uses gpt-4o for reliable function calling
-    - Uses tools/functions API based on SDK version
+    - Runs up to MAX_TOOL_ROUNDS tool-calling rounds in a single loop
+    - Executes independent tool calls within a round concurrently
     - Temperature=0 for deterministic behavior
     """
     try:
-        # Get or create conversation history
-        if phone not in conversation_history:
-            conversation_history[phone] = []
+        # Fast path: trivial greetings/thanks get a canned reply, no OpenAI call
+        canned = GREETING_RESPONSES.get(message.strip().lower().rstrip("!?. "))
+        if canned is not None:
+            await _save_turn_to_history(phone, message, canned)
+            return canned
+
+        history = await _load_history(phone)
 
         # Detect language of current message
         detected_lang = detect_language(message)
@@ -1835,318 +2632,135 @@ def get_ai_response(phone: str, message: str) -> str:
         )
         logger.info(f"🌐 Language detected: {detected_lang.upper()} for message: '{message[:50]}...'")
 
-        # Build messages with explicit language instruction
-        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
-        messages.extend(conversation_history[phone][-10:])  # Last 10 messages
+        # Build messages with explicit language instruction. The static
+        # system prompt leads so the provider-side prefix cache can hit;
+        # everything dynamic (dates, history, language) comes after it.
+        messages = get_system_messages()
+        messages.extend(_trim_history_for_budget(history))
         # Add language instruction as a system message before user's message
         messages.append({"role": "system", "content": lang_instruction})
         messages.append({"role": "user", "content": message})
 
-        # Call OpenAI with version-appropriate syntax
-        if OPENAI_SDK_VERSION >= 1:
-            # New SDK v1.0+ syntax
-            response = openai_client.chat.completions.create(
-                model="gpt-4o",
-                messages=messages,
-                tools=BOOKING_TOOLS,
-                tool_choice="auto",
-                temperature=0
-            )
-            assistant_message = response.choices[0].message
-            has_function_call = bool(assistant_message.tool_calls)
-        else:
-            # Old SDK v0.x syntax
-            response = openai.ChatCompletion.create(
-                model="gpt-4o",
-                messages=messages,
-                functions=BOOKING_FUNCTIONS,
-                function_call="auto",
-                temperature=0
+        # Exact repeat of a recent prompt? The completion is deterministic
+        # at temperature=0, so serve it from cache without calling OpenAI.
+        cache_key = _completion_cache_key(messages)
+        cached_reply = _completion_cache.get(cache_key)
+        if cached_reply is not None:
+            logger.info("⚡ Completion cache hit - skipping OpenAI call")
+            await _save_turn_to_history(phone, message, cached_reply)
+            return cached_reply
+
+        # Read-query results cached for the lifetime of this turn only
+        turn_cache: Dict = {}
+        used_tools = False
+
+        # Run bounded tool-calling rounds until the model answers with text.
+        # The last round is sent without tool schemas: by then the model is
+        # summarizing, and the schemas cost ~400 prompt tokens per call.
+        for round_idx in range(MAX_TOOL_ROUNDS):
+            content, tool_calls = await _call_openai(
+                messages, with_tools=(round_idx < MAX_TOOL_ROUNDS - 1)
             )
-            assistant_message = response["choices"][0]["message"]
-            has_function_call = "function_call" in assistant_message
-
-        # Handle function/tool calls
-        if has_function_call:
-            if OPENAI_SDK_VERSION >= 1:
-                # New SDK: handle tool_calls array
-                tool_calls = assistant_message.tool_calls
-
-                messages.append({
-                    "role": "assistant",
-                    "content": assistant_message.content,
-                    "tool_calls": [
-                        {
-                            "id": tc.id,
-                            "type": "function",
-                            "function": {
-                                "name": tc.function.name,
-                                "arguments": tc.function.arguments
-                            }
-                        } for tc in tool_calls
-                    ]
-                })
-
-                for tool_call in tool_calls:
-                    function_name = tool_call.function.name
-                    function_args = tool_call.function.arguments
-                    tool_call_id = tool_call.id
-
-                    logger.info(f"🔧 AI calling tool: {function_name}")
-                    logger.info(f"   Args: {function_args}")
 
-                    function_result = execute_function(function_name, function_args, phone)
-                    logger.info(f"   Result: {function_result}")
+            if not tool_calls:
+                final_message = content
+                break
 
-                    messages.append({
-                        "role": "tool",
-                        "tool_call_id": tool_call_id,
-                        "content": json.dumps(function_result)
-                    })
-            else:
-                # Old SDK: handle function_call object
-                function_call = assistant_message["function_call"]
-                function_name = function_call["name"]
-                function_args = function_call["arguments"]
+            used_tools = True
+            _append_tool_calls(messages, content, tool_calls)
 
-                logger.info(f"🔧 AI calling function: {function_name}")
+            for _, function_name, function_args in tool_calls:
+                logger.info(f"🔧 AI calling tool: {function_name}")
                 logger.info(f"   Args: {function_args}")
 
-                messages.append(assistant_message)
-
-                function_result = execute_function(function_name, function_args, phone)
+            # Optionally start the follow-up completion speculatively,
+            # assuming availability checks come back free (the common case)
+            spec_task = None
+            spec_results = _predict_tool_results(tool_calls) if SPECULATIVE_FINAL_CALL else None
+            if spec_results is not None:
+                spec_messages = list(messages)
+                for (call_id, function_name, _), predicted in zip(tool_calls, spec_results):
+                    _append_tool_result(spec_messages, call_id, function_name, predicted)
+                spec_task = asyncio.create_task(_call_openai(spec_messages, with_tools=False))
+
+            # Tool calls in one round are independent DB queries - run them
+            # concurrently off the event loop (gather preserves order)
+            function_results = await asyncio.gather(*[
+                asyncio.to_thread(_execute_function_cached, function_name, function_args, phone, turn_cache)
+                for _, function_name, function_args in tool_calls
+            ])
+
+            for (call_id, function_name, _), function_result in zip(tool_calls, function_results):
                 logger.info(f"   Result: {function_result}")
-
-                messages.append({
-                    "role": "function",
-                    "name": function_name,
-                    "content": json.dumps(function_result)
-                })
-
-            # Get second response after function execution
-            if OPENAI_SDK_VERSION >= 1:
-                second_response = openai_client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=messages,
-                    tools=BOOKING_TOOLS,
-                    tool_choice="auto",
-                    temperature=0
-                )
-                second_message = second_response.choices[0].message
-                has_second_call = bool(second_message.tool_calls)
-            else:
-                second_response = openai.ChatCompletion.create(
-                    model="gpt-4o",
-                    messages=messages,
-                    functions=BOOKING_FUNCTIONS,
-                    function_call="auto",
-                    temperature=0
-                )
-                second_message = second_response["choices"][0]["message"]
-                has_second_call = "function_call" in second_message
-
-            # Handle second round of function calls
-            if has_second_call:
-                if OPENAI_SDK_VERSION >= 1:
-                    tool_calls_2 = second_message.tool_calls
-                    messages.append({
-                        "role": "assistant",
-                        "content": second_message.content,
-                        "tool_calls": [
-                            {
-                                "id": tc.id,
-                                "type": "function",
-                                "function": {
-                                    "name": tc.function.name,
-                                    "arguments": tc.function.arguments
-                                }
-                            } for tc in tool_calls_2
-                        ]
-                    })
-
-                    for tool_call in tool_calls_2:
-                        func2_name = tool_call.function.name
-                        func2_args = tool_call.function.arguments
-                        tool_call_id_2 = tool_call.id
-
-                        logger.info(f"🔧 AI calling second tool: {func2_name}")
-                        func2_result = execute_function(func2_name, func2_args, phone)
-                        logger.info(f"   Result: {func2_result}")
-
-                        messages.append({
-                            "role": "tool",
-                            "tool_call_id": tool_call_id_2,
-                            "content": json.dumps(func2_result)
-                        })
-                else:
-                    function_call_2 = second_message["function_call"]
-                    func2_name = function_call_2["name"]
-                    func2_args = function_call_2["arguments"]
-
-                    logger.info(f"🔧 AI calling second function: {func2_name}")
-
-                    messages.append(second_message)
-
-                    func2_result = execute_function(func2_name, func2_args, phone)
-                    logger.info(f"   Result: {func2_result}")
-
-                    messages.append({
-                        "role": "function",
-                        "name": func2_name,
-                        "content": json.dumps(func2_result)
-                    })
-
-                # Get third response
-                if OPENAI_SDK_VERSION >= 1:
-                    third_response = openai_client.chat.completions.create(
-                        model="gpt-4o",
-                        messages=messages,
-                        tools=BOOKING_TOOLS,
-                        tool_choice="auto",
-                        temperature=0
-                    )
-                    third_message = third_response.choices[0].message
-                    has_third_call = bool(third_message.tool_calls)
-                else:
-                    third_response = openai.ChatCompletion.create(
-                        model="gpt-4o",
-                        messages=messages,
-                        functions=BOOKING_FUNCTIONS,
-                        function_call="auto",
-                        temperature=0
-                    )
-                    third_message = third_response["choices"][0]["message"]
-                    has_third_call = "function_call" in third_message
-
-                # Handle third round (rare)
-                if has_third_call:
-                    if OPENAI_SDK_VERSION >= 1:
-                        tool_calls_3 = third_message.tool_calls
-                        messages.append({
-                            "role": "assistant",
-                            "content": third_message.content,
-                            "tool_calls": [
-                                {
-                                    "id": tc.id,
-                                    "type": "function",
-                                    "function": {
-                                        "name": tc.function.name,
-                                        "arguments": tc.function.arguments
-                                    }
-                                } for tc in tool_calls_3
-                            ]
-                        })
-
-                        for tool_call in tool_calls_3:
-                            func3_name = tool_call.function.name
-                            func3_args = tool_call.function.arguments
-                            tool_call_id_3 = tool_call.id
-
-                            logger.info(f"🔧 AI calling third tool: {func3_name}")
-                            func3_result = execute_function(func3_name, func3_args, phone)
-                            logger.info(f"   Result: {func3_result}")
-
-                            messages.append({
-                                "role": "tool",
-                                "tool_call_id": tool_call_id_3,
-                                "content": json.dumps(func3_result)
-                            })
-
-                        fourth_response = openai_client.chat.completions.create(
-                            model="gpt-4o",
-                            messages=messages,
-                            temperature=0
-                        )
-                        final_message = fourth_response.choices[0].message.content or ''
-                    else:
-                        function_call_3 = third_message["function_call"]
-                        func3_name = function_call_3["name"]
-                        func3_args = function_call_3["arguments"]
-
-                        logger.info(f"🔧 AI calling third function: {func3_name}")
-
-                        messages.append(third_message)
-
-                        func3_result = execute_function(func3_name, func3_args, phone)
-                        logger.info(f"   Result: {func3_result}")
-
-                        messages.append({
-                            "role": "function",
-                            "name": func3_name,
-                            "content": json.dumps(func3_result)
-                        })
-
-                        fourth_response = openai.ChatCompletion.create(
-                            model="gpt-4o",
-                            messages=messages,
-                            temperature=0
-                        )
-                        final_message = fourth_response["choices"][0]["message"]["content"] or ''
-                else:
-                    if OPENAI_SDK_VERSION >= 1:
-                        final_message = third_message.content or ''
-                    else:
-                        final_message = third_message.get("content", '') or ''
-            else:
-                if OPENAI_SDK_VERSION >= 1:
-                    final_message = second_message.content or ''
-                else:
-                    final_message = second_message.get("content", '') or ''
-
-            # Save to history
-            conversation_history[phone].append({"role": "user", "content": message})
-            conversation_history[phone].append({"role": "assistant", "content": final_message})
-
-            return final_message
-
+                _append_tool_result(messages, call_id, function_name, function_result)
+
+            if spec_task is not None:
+                if list(function_results) == spec_results:
+                    logger.info("   (speculative completion confirmed)")
+                    final_message, _ = await spec_task
+                    break
+                spec_task.cancel()
         else:
-            # No function call - normal conversation
-            if OPENAI_SDK_VERSION >= 1:
-                response_text = assistant_message.content or ''
-            else:
-                response_text = assistant_message.get("content", '') or ''
+            # Tool budget exhausted - get a closing message without tools
+            final_message, _ = await _call_openai(messages, with_tools=False)
 
-            # Save to history
-            conversation_history[phone].append({"role": "user", "content": message})
-            conversation_history[phone].append({"role": "assistant", "content": response_text})
+        # Cache only pure-text answers: anything that touched a tool
+        # depends on live DB state and must not be replayed.
+        if not used_tools and final_message:
+            _completion_cache[cache_key] = final_message
 
-            return response_text
+        # Save to history. Deliberately only the user text and the final
+        # assistant text: tool-call/tool-result rounds stay in the local
+        # `messages` list and are rebuilt fresh each turn, so history (and
+        # every later prompt built from it) never accumulates tool payloads.
+        await _save_turn_to_history(phone, message, final_message)
+
+        return final_message
 
     except openai.RateLimitError as e:
         logger.error(f"❌ Rate limit error: {e}")
-        return ("We're experiencing high demand. Please try again in a moment. "
-                "/ Alto traffico, riprova tra qualche secondo. "
-                "Or call us at +39 02 8394 5621 / Oppure chiamaci.")
+        return FALLBACK_RATE_LIMIT
     except openai.APITimeoutError as e:
         logger.error(f"❌ API timeout: {e}")
-        return ("Connection slow, please try again. "
-                "/ Connessione lenta, riprova. "
-                "Or call us at +39 02 8394 5621 / Oppure chiamaci.")
+        return FALLBACK_TIMEOUT
     except openai.APIConnectionError as e:
         logger.error(f"❌ API connection error: {e}")
-        return ("Connection issue, please try again. "
-                "/ Problema di connessione, riprova. "
-                "Or call us at +39 02 8394 5621 / Oppure chiamaci.")
+        return FALLBACK_CONNECTION
     except Exception as e:
         logger.error(f"❌ AI Error: {e}")
         import traceback
         logger.error(traceback.format_exc())
-        return ("Something went wrong. Please try again or call us at +39 02 8394 5621. "
-                "/ Qualcosa è andato storto. Riprova o chiamaci al +39 02 8394 5621.")
+        return FALLBACK_ERROR
 
 # ============================================================================
 # WHATSAPP SERVICE
 # ============================================================================
 
+WHATSAPP_API_URL = f"https://graph.facebook.com/v18.0/{WHATSAPP_PHONE_NUMBER_ID}/messages"
+
+# Shared HTTP client (initialized lazily, warmed on startup).
+# Reusing one client keeps TLS connections to graph.facebook.com alive
+# instead of paying a fresh handshake on every outbound message.
+_http_client = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get or initialize the shared WhatsApp HTTP client"""
+    global _http_client
+
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(30.0, connect=5.0),
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+            headers={
+                "Authorization": f"Bearer {WHATSAPP_ACCESS_TOKEN}",
+                "Content-Type": "application/json"
+            }
+        )
+    return _http_client
+
 async def send_whatsapp_message(phone: str, message: str) -> bool:
     """Send WhatsApp message"""
-    url = f"https://graph.facebook.com/v18.0/{WHATSAPP_PHONE_NUMBER_ID}/messages"
-    
-    headers = {
-        "Authorization": f"Bearer {WHATSAPP_ACCESS_TOKEN}",
-        "Content-Type": "application/json"
-    }
-    
     payload = {
         "messaging_product": "whatsapp",
         "recipient_type": "individual",
@@ -2154,39 +2768,30 @@ async def send_whatsapp_message(phone: str, message: str) -> bool:
         "type": "text",
         "text": {"body": message}
     }
-    
+
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, headers=headers, json=payload, timeout=30)
-            if response.status_code == 200:
-                logger.info(f"✅ WhatsApp message sent to {phone}")
-                return True
-            else:
-                logger.error(f"❌ WhatsApp send failed: {response.text}")
-                return False
+        response = await get_http_client().post(WHATSAPP_API_URL, json=payload)
+        if response.status_code == 200:
+            logger.info(f"✅ WhatsApp message sent to {phone}")
+            return True
+        else:
+            logger.error(f"❌ WhatsApp send failed: {response.text}")
+            return False
     except Exception as e:
         logger.error(f"❌ WhatsApp API error: {e}")
         return False
 
 async def mark_as_read(message_id: str) -> bool:
     """Mark message as read"""
-    url = f"https://graph.facebook.com/v18.0/{WHATSAPP_PHONE_NUMBER_ID}/messages"
-    
-    headers = {
-        "Authorization": f"Bearer {WHATSAPP_ACCESS_TOKEN}",
-        "Content-Type": "application/json"
-    }
-    
     payload = {
         "messaging_product": "whatsapp",
         "status": "read",
         "message_id": message_id
     }
-    
+
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, headers=headers, json=payload, timeout=10)
-            return response.status_code == 200
+        response = await get_http_client().post(WHATSAPP_API_URL, json=payload, timeout=10)
+        return response.status_code == 200
     except:
         return False
 
@@ -2197,7 +2802,8 @@ async def mark_as_read(message_id: str) -> bool:
 app = FastAPI(
     title="Aura Hair Studio - WhatsApp Bot with Booking",
     description="Virtual receptionist (Simone) with calendar integration and reliable tool calling",
-    version="4.0.0"
+    version="4.0.0",
+    default_response_class=ORJSONResponse
 )
 
 app.add_middleware(
@@ -2208,13 +2814,65 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+async def _calendar_creds_refresher():
+    """Refresh Google credentials every 30 min so no booking pays for it"""
+    while True:
+        await asyncio.sleep(1800)
+        await asyncio.to_thread(_get_calendar_creds)
+
 @app.on_event("startup")
 async def startup():
     """Initialize on startup"""
     initialize_database()
     setup_reminder_scheduler()
+    get_http_client()  # Warm the shared WhatsApp HTTP client
+    # Load Google credentials now so the first booking skips the cold start
+    await asyncio.to_thread(_get_calendar_creds)
+    asyncio.create_task(_calendar_creds_refresher())
+    # Warm the remaining cold paths so the first webhook doesn't pay for
+    # them: one pooled DB checkout (forces the TCP+TLS+auth handshake),
+    # DNS/TLS to graph.facebook.com, and the OpenAI keep-alive connection.
+    # Each guarded separately - a warm-up failure must never block startup.
+    def _warm_db_pool():
+        pool = _get_db_pool()
+        pool.putconn(pool.getconn())
+    try:
+        await asyncio.to_thread(_warm_db_pool)
+    except Exception as e:
+        logger.warning(f"⚠️ DB pool warm-up failed: {e}")
+    try:
+        await get_http_client().head("https://graph.facebook.com/", timeout=5)
+    except Exception as e:
+        logger.warning(f"⚠️ WhatsApp connection warm-up failed: {e}")
+    if openai_client is not None:
+        try:
+            await openai_client.models.list()
+        except Exception as e:
+            logger.warning(f"⚠️ OpenAI connection warm-up failed: {e}")
+    global _convo_writer_task
+    _convo_writer_task = asyncio.create_task(_convo_writer())
     logger.info(f"🚀 {BUSINESS_NAME} WhatsApp Bot with Booking started!")
 
+@app.on_event("shutdown")
+async def shutdown():
+    """Clean up on shutdown"""
+    global _http_client, _convo_writer_task
+    # Let in-flight message tasks finish so replies aren't dropped
+    if _inflight_messages:
+        await asyncio.gather(*_inflight_messages, return_exceptions=True)
+    if _convo_writer_task is not None:
+        _convo_writer_task.cancel()
+        _convo_writer_task = None
+    # Flush any conversation turns still waiting in the queue
+    rows = []
+    while not _convo_queue.empty():
+        rows.append(_convo_queue.get_nowait())
+    if rows:
+        await asyncio.to_thread(_flush_conversation_batch, rows)
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
 @app.get("/webhook")
 async def verify_webhook(request: Request):
     """WhatsApp webhook verification"""
@@ -2232,24 +2890,35 @@ async def verify_webhook(request: Request):
 async def webhook(request: Request):
     """Handle incoming WhatsApp messages"""
     try:
-        body = await request.json()
-        
+        # orjson parses the raw body in C, ~2-5x faster than request.json()
+        body = orjson.loads(await request.body())
+
         if body.get("object") != "whatsapp_business_account":
-            return JSONResponse({"status": "ignored"})
+            return ORJSONResponse({"status": "ignored"})
         
+        # Acknowledge immediately and process in the background: Meta
+        # redelivers webhooks that don't answer quickly, and a redelivery
+        # would re-run the whole AI round-trip. Per-phone ordering is
+        # still enforced by the phone locks, and process_message catches
+        # and logs its own failures.
         for entry in body.get("entry", []):
             for change in entry.get("changes", []):
                 value = change.get("value", {})
-                messages = value.get("messages", [])
-                
-                for message in messages:
-                    await process_message(message, value)
-        
-        return JSONResponse({"status": "processed"})
+                for m in value.get("messages", []):
+                    task = asyncio.create_task(process_message(m, value))
+                    _inflight_messages.add(task)
+                    task.add_done_callback(_inflight_messages.discard)
+
+        return ORJSONResponse({"status": "queued"})
     
     except Exception as e:
         logger.error(f"❌ Webhook error: {e}")
-        return JSONResponse({"status": "error"})
+        return ORJSONResponse({"status": "error"})
+
+# Strong references to in-flight background message tasks; the event
+# loop only keeps weak ones, so without this a task could be collected
+# mid-processing
+_inflight_messages: set = set()
 
 async def process_message(message: Dict[str, Any], value: Dict[str, Any]):
     """Process incoming message"""
@@ -2258,24 +2927,27 @@ async def process_message(message: Dict[str, Any], value: Dict[str, Any]):
         message_id = message.get("id")
         message_type = message.get("type", "text")
         
-        # Get contact name
-        contacts = value.get("contacts", [])
-        contact_name = contacts[0].get("profile", {}).get("name", "Cliente") if contacts else "Cliente"
+        # Get contact name (cached per phone for payloads without contacts)
+        contact_name = _resolve_contact_name(phone, value)
         
         logger.info(f"💬 Message from {phone} ({contact_name})")
-        
-        await mark_as_read(message_id)
-        
+
+        # Fire the read receipt concurrently with the actual handling -
+        # the customer sees the blue ticks while the AI is still thinking
+        read_receipt = asyncio.create_task(mark_as_read(message_id)) if message_id else None
+
         if message_type == "text":
             text = message.get("text", {}).get("body", "")
             if text:
                 logger.info(f"📝 Message: {text[:100]}...")
 
                 # All messages go through AI - AI will call confirm_reminder if needed
-                response = get_ai_response(phone, text)
+                # Serialized per phone to prevent duplicate-booking races
+                async with _get_phone_lock(phone):
+                    response = await get_ai_response(phone, text)
 
-                # Log conversation to database for analytics
-                save_conversation_to_db(phone, contact_name, text, response)
+                # Queue conversation logging for the background batch writer
+                log_conversation(phone, contact_name, text, response)
 
                 # Log response preview
                 logger.info(f"📤 Response: {response[:100]}...")
@@ -2287,25 +2959,27 @@ async def process_message(message: Dict[str, Any], value: Dict[str, Any]):
             text = interactive.get("button_reply", {}).get("title", "") or \
                    interactive.get("list_reply", {}).get("title", "")
             if text:
-                response = get_ai_response(phone, text)
+                async with _get_phone_lock(phone):
+                    response = await get_ai_response(phone, text)
 
-                # Log conversation to database for analytics
-                save_conversation_to_db(phone, contact_name, text, response)
+                # Queue conversation logging for the background batch writer
+                log_conversation(phone, contact_name, text, response)
 
                 await send_whatsapp_message(phone, response)
         
         else:
-            await send_whatsapp_message(phone,
-                "I can only respond to text messages. How can I help you with your booking? 💇‍♀️\n\n"
-                "Posso rispondere solo a messaggi di testo. Come posso aiutarti con la prenotazione? 💇‍♀️")
-    
+            await send_whatsapp_message(phone, FALLBACK_NONTEXT)
+
+        if read_receipt is not None:
+            await read_receipt
+
     except Exception as e:
         logger.error(f"Process message error: {e}")
 
 @app.get("/health")
 async def health_check():
     """Health check"""
-    return JSONResponse({
+    return ORJSONResponse({
         "status": "healthy",
         "service": BUSINESS_NAME,
         "type": BUSINESS_TYPE,
@@ -2319,19 +2993,19 @@ async def health_check():
             "model": "gpt-4o"
         },
         "scheduler_running": scheduler.running if scheduler else False,
-        "services": list(SALON_SERVICES.keys()),
+        "services": VALID_SERVICE_CODES,
         "timestamp": datetime.now().isoformat()
     })
 
 @app.get("/")
 async def root():
     """Root endpoint"""
-    return JSONResponse({
+    return ORJSONResponse({
         "name": f"{BUSINESS_NAME} - WhatsApp Bot",
         "version": "4.0.0",
         "features": ["booking", "calendar", "AI", "tools_api", "strict_mode", "reminders"],
         "model": "gpt-4o",
-        "services": [f"{s['name_it']} - €{s['price']}" for s in SALON_SERVICES.values()]
+        "services": [f"{s.name_it} - €{s.price}" for s in SALON_SERVICES.values()]
     })
 
 # ============================================================================
@@ -2342,7 +3016,7 @@ async def root():
 async def trigger_reminders():
     """Manually trigger sending reminders (for testing)"""
     await send_reminder_messages()
-    return JSONResponse({
+    return ORJSONResponse({
         "status": "completed",
         "message": "Reminder job executed"
     })
@@ -2351,7 +3025,7 @@ async def trigger_reminders():
 async def trigger_unconfirmed_check():
     """Manually trigger unconfirmed check (for testing)"""
     await check_unconfirmed_and_notify()
-    return JSONResponse({
+    return ORJSONResponse({
         "status": "completed",
         "message": "Unconfirmed check executed"
     })
@@ -2360,10 +3034,10 @@ async def trigger_unconfirmed_check():
 async def reminder_status():
     """Get reminder system status"""
     tomorrow = (datetime.now(ITALY_TZ) + timedelta(days=1)).strftime("%Y-%m-%d")
-    tomorrow_apts = get_tomorrow_appointments()
-    unconfirmed = get_unconfirmed_appointments()
+    tomorrow_apts = await asyncio.to_thread(get_tomorrow_appointments)
+    unconfirmed = await asyncio.to_thread(get_unconfirmed_appointments)
 
-    return JSONResponse({
+    return ORJSONResponse({
         "scheduler_running": scheduler.running,
         "tomorrow_date": tomorrow,
         "appointments_needing_reminder": len(tomorrow_apts),
@@ -2380,7 +3054,7 @@ async def test_email():
         "Test Email - Aura Hair Studio",
         "Questo è un test del sistema di notifiche email.\n\nSe ricevi questa email, il sistema funziona correttamente!"
     )
-    return JSONResponse({
+    return ORJSONResponse({
         "success": success,
         "sent_to": OWNER_EMAIL
     })
@@ -2401,12 +3075,21 @@ if __name__ == "__main__":
     logger.info(f"🤖 AI: Function Calling ENABLED")
     logger.info("=" * 60)
     
+    # uvloop + httptools come with uvicorn[standard] and cut per-request
+    # event-loop and HTTP-parsing overhead. WEB_CONCURRENCY > 1 scales
+    # across cores, but conversation_history and the per-phone locks are
+    # per-process - only raise it behind a sticky load balancer or once
+    # history lives in a shared store.
     uvicorn.run(
         "salon_bot_with_booking:app",
         host="0.0.0.0",
         port=8000,
         reload=False,
-        log_level="info"
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+        loop="uvloop",
+        http="httptools",
+        log_level="info",
+        access_log=False  # app logging already covers each message
     )
 
 
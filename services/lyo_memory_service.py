@@ -3,12 +3,39 @@ LYO MEMORY SERVICE: Adapted from Solo Chat
 Session-based memory with conversation persistence and behavioral learning
 """
 import asyncio
-import json
+import orjson
+import os
+from collections import OrderedDict, deque
 from datetime import datetime, timezone
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Any
+from dataclasses import asdict, dataclass, field, fields
 
-@dataclass
+# Ring-buffer size for per-session message history
+MAX_SESSION_MESSAGES = 50
+
+# LRU bounds for the in-memory stores: without them every phone number
+# that ever messaged the bot stays resident for the life of the process.
+# Profiles get a larger budget than sessions so a user's name and
+# preferences survive their conversation context being evicted.
+MAX_ACTIVE_SESSIONS = 10_000
+MAX_USER_PROFILES = 20_000
+
+# Optional Redis system-of-record behind the in-memory LRU: sessions
+# survive restarts and stay consistent across uvicorn workers. Without
+# REDIS_URL the service behaves exactly as before (memory only).
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:
+    redis_asyncio = None
+
+_SESSION_KEY = "lyo:session:{}"
+SESSION_TTL_SECONDS = 86400  # 24h, matching memory_manager's session expiry
+
+# Write-behind coalescing window: mutations within this window are
+# flushed to Redis as one pipeline instead of one SET per message
+FLUSH_INTERVAL_SECONDS = 0.05
+
+@dataclass(frozen=True, slots=True)
 class LyoConversationMessage:
     """Individual conversation message"""
     role: str  # "user" or "assistant"
@@ -18,7 +45,7 @@ class LyoConversationMessage:
     intent_type: str = "general"
     sequence: int = 0
 
-@dataclass  
+@dataclass(slots=True)
 class LyoUserProfile:
     """User profile and preferences"""
     user_id: str
@@ -33,90 +60,301 @@ class LyoUserProfile:
     preferred_services: List[str] = field(default_factory=list)
     booking_patterns: Dict[str, Any] = field(default_factory=dict)
 
-@dataclass
+@dataclass(slots=True)
+class LyoBookingState:
+    """
+    In-progress booking collected during a conversation. A fixed slotted
+    schema instead of a per-session dict: cheaper per session and typos
+    in field names fail loudly instead of creating stray keys.
+    """
+    customer_name: Optional[str] = None
+    service: Optional[str] = None
+    date: Optional[str] = None
+    time: Optional[str] = None
+    phone: Optional[str] = None
+    notes: Optional[str] = None
+    confirmed: bool = False
+
+_BOOKING_STATE_FIELDS = {f.name for f in fields(LyoBookingState)}
+
+@dataclass(slots=True)
 class LyoConversationContext:
     """Complete conversation context for a user session"""
     session_id: str
     user_profile: LyoUserProfile
-    messages: List[LyoConversationMessage] = field(default_factory=list)
-    current_booking_state: Dict[str, Any] = field(default_factory=dict)
+    # Bounded ring buffer: appends are O(1) and the oldest message falls
+    # off for free, instead of the old list-slice trim that copied the
+    # whole history every time it overflowed
+    messages: Deque[LyoConversationMessage] = field(
+        default_factory=lambda: deque(maxlen=MAX_SESSION_MESSAGES)
+    )
+    current_booking_state: LyoBookingState = field(default_factory=LyoBookingState)
     conversation_topic: Optional[str] = None
-    
-    def add_message(self, role: str, content: str, language: str = "italian", intent_type: str = "general"):
-        """Add message to conversation history"""
+    # Monotonic message counter; len(messages) would reset sequences
+    # once the ring buffer starts evicting
+    next_sequence: int = 0
+    # Summary state maintained on append so get_conversation_summary is
+    # O(1) instead of rescanning every message per context fetch. These
+    # are monotonic: entries survive ring-buffer eviction, which is the
+    # right semantics for "seen during this conversation".
+    languages_seen: set = field(default_factory=set)
+    intents_seen: set = field(default_factory=set)
+    first_timestamp: Optional[datetime] = None
+
+    def add_message(self, role: str, content: str, language: str = "italian", intent_type: str = "general") -> LyoConversationMessage:
+        """Add message to conversation history; returns the stored message"""
         message = LyoConversationMessage(
             role=role,
             content=content,
             timestamp=datetime.now(timezone.utc),
             language=language,
             intent_type=intent_type,
-            sequence=len(self.messages)
+            sequence=self.next_sequence
         )
+        self.next_sequence += 1
         self.messages.append(message)
-        
-        # Keep last 50 messages (manageable memory)
-        if len(self.messages) > 50:
-            self.messages = self.messages[-40:]  # Keep 40, remove oldest 10
-    
+        self.languages_seen.add(language)
+        self.intents_seen.add(intent_type)
+        if self.first_timestamp is None:
+            self.first_timestamp = message.timestamp
+        return message
+
     def get_recent_messages(self, count: int = 10) -> List[LyoConversationMessage]:
         """Get recent messages for context"""
-        return self.messages[-count:] if self.messages else []
+        if not self.messages:
+            return []
+        return list(self.messages)[-count:]
     
     def get_conversation_summary(self) -> Dict[str, Any]:
         """Get conversation summary for context"""
         if not self.messages:
             return {"total_messages": 0, "languages_used": [], "topics_discussed": []}
-        
-        languages = list(set(msg.language for msg in self.messages))
-        intents = list(set(msg.intent_type for msg in self.messages))
-        
+
         return {
             "total_messages": len(self.messages),
-            "languages_used": languages,
-            "intents_seen": intents,
-            "last_language": self.messages[-1].language if self.messages else "italian",
-            "conversation_started": self.messages[0].timestamp.isoformat() if self.messages else None
+            "languages_used": list(self.languages_seen),
+            "intents_seen": list(self.intents_seen),
+            "last_language": self.messages[-1].language,
+            "conversation_started": self.first_timestamp.isoformat() if self.first_timestamp else None
         }
 
+def _context_to_dict(context: "LyoConversationContext") -> Dict[str, Any]:
+    """Flatten a conversation context for orjson serialization (datetime
+    fields are left native - orjson encodes them directly as RFC 3339)"""
+    profile = context.user_profile
+    return {
+        "session_id": context.session_id,
+        "conversation_topic": context.conversation_topic,
+        "current_booking_state": asdict(context.current_booking_state),
+        "next_sequence": context.next_sequence,
+        "languages_seen": sorted(context.languages_seen),
+        "intents_seen": sorted(context.intents_seen),
+        "first_timestamp": context.first_timestamp,
+        "messages": [
+            {
+                "role": msg.role,
+                "content": msg.content,
+                "timestamp": msg.timestamp,
+                "language": msg.language,
+                "intent_type": msg.intent_type,
+                "sequence": msg.sequence
+            }
+            for msg in context.messages
+        ],
+        "user_profile": {
+            "user_id": profile.user_id,
+            "name": profile.name,
+            "language_preference": profile.language_preference,
+            "interaction_count": profile.interaction_count,
+            "first_seen": profile.first_seen,
+            "last_seen": profile.last_seen,
+            "past_appointments": profile.past_appointments,
+            "preferred_services": profile.preferred_services,
+            "booking_patterns": profile.booking_patterns
+        }
+    }
+
+def _context_from_dict(session_id: str, data: Dict[str, Any]) -> "LyoConversationContext":
+    """Rebuild a conversation context from its serialized form"""
+    raw_profile = data["user_profile"]
+    profile = LyoUserProfile(
+        user_id=raw_profile["user_id"],
+        name=raw_profile.get("name"),
+        language_preference=raw_profile.get("language_preference"),
+        interaction_count=raw_profile.get("interaction_count", 0),
+        first_seen=datetime.fromisoformat(raw_profile["first_seen"]),
+        last_seen=datetime.fromisoformat(raw_profile["last_seen"]),
+        past_appointments=raw_profile.get("past_appointments", []),
+        preferred_services=raw_profile.get("preferred_services", []),
+        booking_patterns=raw_profile.get("booking_patterns", {})
+    )
+    context = LyoConversationContext(
+        session_id=session_id,
+        user_profile=profile,
+        current_booking_state=LyoBookingState(**{
+            k: v for k, v in (data.get("current_booking_state") or {}).items()
+            if k in _BOOKING_STATE_FIELDS
+        }),
+        conversation_topic=data.get("conversation_topic"),
+        next_sequence=data.get("next_sequence", 0),
+        languages_seen=set(data.get("languages_seen") or []),
+        intents_seen=set(data.get("intents_seen") or []),
+        first_timestamp=(
+            datetime.fromisoformat(data["first_timestamp"])
+            if data.get("first_timestamp") else None
+        )
+    )
+    for msg in data.get("messages", []):
+        context.messages.append(LyoConversationMessage(
+            role=msg["role"],
+            content=msg["content"],
+            timestamp=datetime.fromisoformat(msg["timestamp"]),
+            language=msg.get("language", "italian"),
+            intent_type=msg.get("intent_type", "general"),
+            sequence=msg.get("sequence", 0)
+        ))
+    return context
+
 class LyoMemoryService:
     """
     SIMPLIFIED MEMORY SERVICE FOR LYO
-    Session-based memory without complex graph database
+    Session-based memory without complex graph database.
+    Optionally backed by Redis (REDIS_URL) so sessions survive restarts
+    and stay shared across workers; memory acts as the hot cache.
     """
-    
-    def __init__(self):
-        # In-memory storage (can be upgraded to Redis/database later)
-        self.sessions: Dict[str, LyoConversationContext] = {}
-        self.user_profiles: Dict[str, LyoUserProfile] = {}
-        
+
+    def __init__(self, redis_url: Optional[str] = None):
+        # In-memory storage, LRU-ordered: most recently touched entries
+        # at the tail, eviction pops from the head
+        self.sessions: "OrderedDict[str, LyoConversationContext]" = OrderedDict()
+        self.user_profiles: "OrderedDict[str, LyoUserProfile]" = OrderedDict()
+
         # Performance tracking
         self.total_sessions = 0
         self.total_messages = 0
-    
+        self.session_evictions = 0
+        self.profile_evictions = 0
+
+        if redis_url is None:
+            redis_url = os.getenv("REDIS_URL", "")
+        self._redis = redis_asyncio.from_url(redis_url) if (redis_url and redis_asyncio) else None
+
+        # Write-behind state: mutated session ids accumulate here and a
+        # short-lived background task flushes them in one pipeline
+        self._dirty: set = set()
+        self._flush_task: Optional[asyncio.Task] = None
+
+        # Last-built recent_messages payload per session, keyed by the
+        # append counter so a stale build is never served
+        self._context_cache: Dict[str, tuple] = {}
+
+    async def _load_session(self, session_id: str) -> Optional[LyoConversationContext]:
+        """Fetch a session from the backing store; None on miss/no Redis"""
+        if self._redis is None:
+            return None
+        try:
+            raw = await self._redis.get(_SESSION_KEY.format(session_id))
+            if not raw:
+                return None
+            return _context_from_dict(session_id, orjson.loads(raw))
+        except Exception as e:
+            print(f"Error loading session from backend: {e}")
+            return None
+
+    def _mark_dirty(self, session_id: str) -> None:
+        """
+        Queue a session for the next coalesced flush. The caller's only
+        cost is a set add; serialization and the Redis round-trip happen
+        once per flush window, not once per message.
+        """
+        if self._redis is None:
+            return
+        self._dirty.add(session_id)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        """Drain the dirty set until it stays empty, one window at a time"""
+        while self._dirty:
+            await asyncio.sleep(FLUSH_INTERVAL_SECONDS)
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Persist all dirty sessions in a single Redis pipeline"""
+        if self._redis is None or not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        try:
+            pipe = self._redis.pipeline()
+            for session_id in dirty:
+                context = self.sessions.get(session_id)
+                if context is not None:
+                    pipe.set(
+                        _SESSION_KEY.format(session_id),
+                        orjson.dumps(_context_to_dict(context)),
+                        ex=SESSION_TTL_SECONDS
+                    )
+            await pipe.execute()
+        except Exception as e:
+            print(f"Error flushing sessions: {e}")
+
+    async def aclose(self) -> None:
+        """Flush pending writes and release the Redis connection"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+        await self.flush()
+        if self._redis is not None:
+            await self._redis.aclose()
+
     async def get_or_create_session(self, session_id: str) -> LyoConversationContext:
         """
         Get existing session or create new one with clean state
         """
-        if session_id not in self.sessions:
-            # Create new user profile if needed
-            if session_id not in self.user_profiles:
-                self.user_profiles[session_id] = LyoUserProfile(
+        context = self.sessions.get(session_id)
+        if context is not None:
+            self.sessions.move_to_end(session_id)
+            if session_id in self.user_profiles:
+                self.user_profiles.move_to_end(session_id)
+            context.user_profile.last_seen = datetime.now(timezone.utc)
+            return context
+
+        # Cold miss: check the backing store before starting from blank
+        # state (the session may live on another worker or predate a
+        # restart)
+        context = await self._load_session(session_id)
+        now = datetime.now(timezone.utc)
+        if context is None:
+            # Reuse the profile if we still have it (it may outlive an
+            # evicted session), otherwise create a fresh one
+            profile = self.user_profiles.get(session_id)
+            if profile is None:
+                profile = LyoUserProfile(
                     user_id=session_id,
-                    first_seen=datetime.now(timezone.utc)
+                    first_seen=now
                 )
-            
-            # Create new conversation context
-            self.sessions[session_id] = LyoConversationContext(
+            context = LyoConversationContext(
                 session_id=session_id,
-                user_profile=self.user_profiles[session_id]
+                user_profile=profile
             )
-            
             self.total_sessions += 1
-        
+
+        self.sessions[session_id] = context
+        self.user_profiles[session_id] = context.user_profile
+        self.user_profiles.move_to_end(session_id)
+
+        # Evict the coldest entries once over budget
+        while len(self.sessions) > MAX_ACTIVE_SESSIONS:
+            evicted_id, _ = self.sessions.popitem(last=False)
+            self._context_cache.pop(evicted_id, None)
+            self.session_evictions += 1
+        while len(self.user_profiles) > MAX_USER_PROFILES:
+            self.user_profiles.popitem(last=False)
+            self.profile_evictions += 1
+
         # Update last seen
-        self.user_profiles[session_id].last_seen = datetime.now(timezone.utc)
-        
-        return self.sessions[session_id]
+        context.user_profile.last_seen = now
+
+        return context
     
     async def save_message(
         self, 
@@ -130,17 +368,19 @@ class LyoMemoryService:
         Save message to conversation history
         """
         context = await self.get_or_create_session(session_id)
-        context.add_message(role, content, language, intent_type)
-        
-        # Update user profile
+        message = context.add_message(role, content, language, intent_type)
+
+        # Update user profile; reuse the message timestamp instead of
+        # taking another clock reading for the same instant
         context.user_profile.interaction_count += 1
-        context.user_profile.last_seen = datetime.now(timezone.utc)
-        
+        context.user_profile.last_seen = message.timestamp
+
         # Update language preference
         if role == "user" and not context.user_profile.language_preference:
             context.user_profile.language_preference = language
-        
+
         self.total_messages += 1
+        self._mark_dirty(context.session_id)
     
     async def save_user_name(self, session_id: str, name: str) -> bool:
         """
@@ -149,6 +389,7 @@ class LyoMemoryService:
         try:
             context = await self.get_or_create_session(session_id)
             context.user_profile.name = name
+            self._mark_dirty(context.session_id)
             return True
         except Exception as e:
             print(f"Error saving name: {e}")
@@ -167,14 +408,18 @@ class LyoMemoryService:
         Get conversation context for AI processing
         """
         context = await self.get_or_create_session(session_id)
-        recent_messages = context.get_recent_messages(message_count)
         summary = context.get_conversation_summary()
-        
-        return {
-            "session_id": session_id,
-            "user_name": context.user_profile.name,
-            "language_preference": context.user_profile.language_preference,
-            "recent_messages": [
+
+        # The dict list (and its per-message isoformat calls) only
+        # changes when a message is appended; reuse the last build when
+        # nothing has. next_sequence is the append counter, so it makes
+        # an exact invalidation key.
+        cache_key = (context.next_sequence, message_count)
+        cached = self._context_cache.get(session_id)
+        if cached is not None and cached[0] == cache_key:
+            recent_payload = cached[1]
+        else:
+            recent_payload = [
                 {
                     "role": msg.role,
                     "content": msg.content,
@@ -182,10 +427,17 @@ class LyoMemoryService:
                     "intent": msg.intent_type,
                     "timestamp": msg.timestamp.isoformat()
                 }
-                for msg in recent_messages
-            ],
+                for msg in context.get_recent_messages(message_count)
+            ]
+            self._context_cache[session_id] = (cache_key, recent_payload)
+
+        return {
+            "session_id": session_id,
+            "user_name": context.user_profile.name,
+            "language_preference": context.user_profile.language_preference,
+            "recent_messages": recent_payload,
             "conversation_summary": summary,
-            "current_booking": context.current_booking_state,
+            "current_booking": asdict(context.current_booking_state),
             "interaction_count": context.user_profile.interaction_count
         }
     
@@ -202,7 +454,9 @@ class LyoMemoryService:
                     session_id=session_id,
                     user_profile=user_profile
                 )
-                
+                self._context_cache.pop(session_id, None)
+                self._mark_dirty(session_id)
+
                 return True
             return False
         except Exception as e:
@@ -219,7 +473,13 @@ class LyoMemoryService:
         """
         try:
             context = await self.get_or_create_session(session_id)
-            context.current_booking_state.update(booking_data)
+            state = context.current_booking_state
+            for key, value in booking_data.items():
+                if key in _BOOKING_STATE_FIELDS:
+                    setattr(state, key, value)
+                else:
+                    print(f"Ignoring unknown booking field: {key}")
+            self._mark_dirty(context.session_id)
             return True
         except Exception as e:
             print(f"Error updating booking state: {e}")
@@ -235,6 +495,8 @@ class LyoMemoryService:
             "total_messages": self.total_messages,
             "total_users": len(self.user_profiles),
             "users_with_names": len([p for p in self.user_profiles.values() if p.name]),
+            "session_evictions": self.session_evictions,
+            "profile_evictions": self.profile_evictions,
             "memory_service_type": "simplified_session_based"
         }
 